@@ -3,6 +3,9 @@ import random
 import matplotlib.pyplot as plt
 import numpy as np
 import statistics
+from fenwick import FenwickTree
+from csr_graph import CSRGraph
+from graph_store import save_graph
 def save_edge_list_txt(G, filename):
     with open(filename, "w") as f:
         for u, v in G.edges():
@@ -61,47 +64,94 @@ def preferential_attachment_graph(N, m=1, beta=1.0, seed=None):
     
     return G
 
-N = 1000
-
-"""
-beta
-m = 10
-for i in range (0, 101):
-    beta = i/100
-    G = preferential_attachment_graph(N, m, beta)
-
-    # Plot the graph
-    plt.figure(figsize=(8,6))  
-    pos = nx.spring_layout(G)
-    nx.draw(G, pos, node_size=5, node_color='skyblue', with_labels=False)
-    plt.savefig(f"PA_beta_pngs/PA_{beta}.png", dpi=300, bbox_inches="tight")
-
-    degrees = dict(G.degree())
-    degree_values = list(degrees.values())
-    print(statistics.mean(degree_values))
-    degree_variance = statistics.variance(degree_values)
-    print(f"Degree Variance: {degree_variance}")
-
-    filename = f"PA_beta/PA_{beta}.txt"
-    save_edge_list_txt(G, filename)
-"""
-
-beta = 0.5
-for m in range (5, 105, 5):
-    beta = 1
-    G = preferential_attachment_graph(N, m, beta)
-
-    # Plot the graph
-    #plt.figure(figsize=(8,6))  
-    #pos = nx.spring_layout(G)
-    #nx.draw(G, pos, node_size=5, node_color='skyblue', with_labels=False)
-    #plt.savefig(f"PA_m_pngs/PA_{beta}.png", dpi=300, bbox_inches="tight")
-
-    degrees = dict(G.degree())
-    degree_values = list(degrees.values())
-    print(statistics.mean(degree_values))
-    degree_variance = statistics.variance(degree_values)
-    print(f"Degree Variance: {degree_variance}")
-
-    filename = f"PA_m/PA_{beta}.txt"
-    save_edge_list_txt(G, filename)
\ No newline at end of file
+def preferential_attachment_edges(N, m=1, beta=1.0, seed=None):
+    """
+    Edge array of a generalized PA graph with the same distribution as
+    preferential_attachment_graph, in O(N m log N).
+
+    The attachment weights degree**beta live in a Fenwick tree, so updating
+    a degree and drawing a target are O(log N) instead of renormalising all
+    N probabilities for every new node. The m distinct targets are drawn in
+    batches, which is equivalent to redrawing until m distinct nodes are hit.
+    """
+    rng = np.random.default_rng(seed)
+    weights = FenwickTree(N)
+    degrees = np.zeros(N, dtype=np.int64)
+    edges = []
+
+    for new_node in range(1, N):
+        k = min(m, new_node)
+        if weights.total() <= 0:
+            # If all degrees are zero, attach randomly
+            targets = rng.choice(new_node, size=k, replace=False)
+        else:
+            targets = weights.sample_distinct(k, rng)
+
+        edges.append(np.column_stack([np.full(k, new_node), targets]))
+
+        degrees[new_node] = k
+        degrees[targets] += 1
+        changed = np.append(targets, new_node)
+        weights.set(changed, degrees[changed].astype(float) ** beta)
+
+    if not edges:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.concatenate(edges)
+
+
+def preferential_attachment_graph_fast(N, m=1, beta=1.0, seed=None):
+    """
+    Drop-in replacement for preferential_attachment_graph built on
+    preferential_attachment_edges.
+    """
+    G = nx.Graph()
+    G.add_nodes_from(range(N))
+    G.add_edges_from(preferential_attachment_edges(N, m, beta, seed).tolist())
+    return G
+
+
+if __name__ == "__main__":
+    N = 1000
+
+    """
+    beta
+    m = 10
+    for i in range (0, 101):
+        beta = i/100
+        G = preferential_attachment_graph(N, m, beta)
+
+        # Plot the graph
+        plt.figure(figsize=(8,6))  
+        pos = nx.spring_layout(G)
+        nx.draw(G, pos, node_size=5, node_color='skyblue', with_labels=False)
+        plt.savefig(f"PA_beta_pngs/PA_{beta}.png", dpi=300, bbox_inches="tight")
+
+        degrees = dict(G.degree())
+        degree_values = list(degrees.values())
+        print(statistics.mean(degree_values))
+        degree_variance = statistics.variance(degree_values)
+        print(f"Degree Variance: {degree_variance}")
+
+        filename = f"PA_beta/PA_{beta}.txt"
+        save_edge_list_txt(G, filename)
+    """
+
+    beta = 0.5
+    for m in range (5, 105, 5):
+        beta = 1
+        G = preferential_attachment_graph_fast(N, m, beta)
+
+        # Plot the graph
+        #plt.figure(figsize=(8,6))  
+        #pos = nx.spring_layout(G)
+        #nx.draw(G, pos, node_size=5, node_color='skyblue', with_labels=False)
+        #plt.savefig(f"PA_m_pngs/PA_{beta}.png", dpi=300, bbox_inches="tight")
+
+        degrees = dict(G.degree())
+        degree_values = list(degrees.values())
+        print(statistics.mean(degree_values))
+        degree_variance = statistics.variance(degree_values)
+        print(f"Degree Variance: {degree_variance}")
+
+        filename = f"PA_m/PA_{beta}.txt"
+        save_graph(CSRGraph.from_networkx(G), filename)
\ No newline at end of file
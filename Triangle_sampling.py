@@ -1,83 +1,142 @@
 import networkx as nx
 import numpy as np
 import random
-import copy
 import sys
+import time
+from degree_correlation import amplification_and_acceleration
 
 class Sampler(object):
+    """
+    Degree-preserving double edge swaps on a random d-regular graph, tuned
+    towards a target transitivity.
+
+    The neighbours of every node are kept both as a set, so an edge lookup
+    is O(1) and the triangles through an edge are an intersection costing
+    O(min degree), and as one Python int bitset, so the connectivity
+    searches expand a whole frontier per step. Swaps preserve degrees, so
+    the number of connected triples is fixed and the exact triangle count,
+    updated by the triangles through the two removed and two added edges,
+    gives the transitivity after every swap. Swaps accepted since the last
+    connectivity check are logged and undone in reverse order if the graph
+    turned out disconnected.
+    """
+
     def __init__(self, d, n):
-        self.G = nx.random_regular_graph(d, n)
-        #self.G = copy.deepcopy(g)
-        self.g = copy.deepcopy(self.G)
-        self.edgelist = list(self.g.edges)
-        
+        G = nx.random_regular_graph(d, n)
+        self.n = n
+        self.edgelist = list(G.edges)
+        self.adj = [0] * n
+        self.nbrs = [set() for _ in range(n)]
+        for u, v in self.edgelist:
+            self.adj[u] |= 1 << v
+            self.adj[v] |= 1 << u
+            self.nbrs[u].add(v)
+            self.nbrs[v].add(u)
+        self.degrees = [d for _, d in sorted(G.degree)]
+
+        self.n_triads = sum(k * (k - 1) // 2 for k in self.degrees)
+        self.n_triangles = sum(self._triangles(u, v) for u, v in self.edgelist) // 3
+        self.n_trans = self.transitivity()
+
         self.n_trials = 100
         self.T_check = 100
         self.t_check = 0
-        
-        self._aux = dict()
 
-    def amplification_and_acceleration(self):
-        dlist = dict(self.g.degree())
-        N = len(dlist)
-        corr = np.zeros((N, N))
-        p = np.zeros(N)
+        # (r1, r2, change in triangles) of swaps accepted since the last
+        # connectivity check
+        self._log = []
+        self.n_accepted = 0
 
-        for d in dlist:
-            p[dlist[d]] += 1
+    @property
+    def G(self):
+        """networkx copy of the current graph."""
+        G = nx.Graph()
+        G.add_nodes_from(range(self.n))
+        G.add_edges_from(self.edgelist)
+        return G
 
+    def transitivity(self):
+        return 3 * self.n_triangles / self.n_triads if self.n_triads else 0.0
 
-        for u, v in self.g.edges:
-            d0 = dlist[u]
-            d1 = dlist[v]
-            corr[d0, d1] += 1 / p[d0] / d0
-            corr[d1, d0] += 1 / p[d1] / d1
+    def has_edge(self, u, v):
+        return v in self.nbrs[u]
 
-        p = p / N
-        idx = np.nonzero(p)[0]
-        idx = idx[idx > 0]  # avoid division by zero
+    def _triangles(self, u, v):
+        # set & iterates over the smaller operand
+        return len(self.nbrs[u] & self.nbrs[v])
+
+    def amplification_and_acceleration(self):
+        return amplification_and_acceleration(np.array(self.edgelist), self.n)
+        
+    def is_connected(self):
+        # breadth-first search over bitsets, a whole frontier per step
+        seen = frontier = 1
+        while frontier:
+            reached = 0
+            while frontier:
+                low = frontier & -frontier
+                reached |= self.adj[low.bit_length() - 1]
+                frontier ^= low
+            frontier = reached & ~seen
+            seen |= frontier
+        return seen == (1 << self.n) - 1
 
-        if len(idx) == 0:
-            return np.nan, np.nan
+    def _connected(self, u, v):
+        """
+        Whether u and v are in the same component: BFS from both ends,
+        growing the smaller frontier, until they meet or one side runs out.
+        A disconnecting swap cuts off a piece, so the side exploring that
+        piece runs out after visiting only it.
+        """
+        seen = [1 << u, 1 << v]
+        frontier = list(seen)
+        while not seen[0] & seen[1]:
+            side = 0 if frontier[0].bit_count() <= frontier[1].bit_count() else 1
+            reached = 0
+            f = frontier[side]
+            while f:
+                low = f & -f
+                reached |= self.adj[low.bit_length() - 1]
+                f ^= low
+            frontier[side] = reached & ~seen[side]
+            if not frontier[side]:
+                return False
+            seen[side] |= frontier[side]
+        return True
 
-        p = p[idx]
-        corr = corr[idx][:, idx]
-        amp = (p.T @ corr @ (1 / idx)[:, None]) / (p.T @ corr @ (1 / idx**2)[:, None])
-        amp = (amp / idx) @ p
+    def _report(self, start):
+        elapsed = time.perf_counter() - start
+        # swaps undone by a failed connectivity check do not count
+        print("%d accepted swaps kept in %.1fs (%.0f per second)"
+              % (self.n_accepted, elapsed, self.n_accepted / max(elapsed, 1e-9)))
 
-        acc = (p.T @ corr @ (1 / idx**2)[:, None])
-        acc = acc / ((p / idx).sum()) ** 2
-        amp = float(np.squeeze(amp))
-        acc = float(np.squeeze(acc))
+    def _rollback(self):
+        self.n_accepted -= len(self._log)
+        for r1, r2, delta in reversed(self._log):
+            self.swap(r1, r2)
+            self.n_triangles -= delta
+        self._log = []
+        self.n_trans = self.transitivity()
 
-        return amp, 1 / acc
-        
     def _check_connectivity(self):
         if self.T_check == self.t_check:
             self.t_check = 0
             
-            if nx.is_connected(self.g):
+            if self.is_connected():
                 self.T_check += 1
-                self.G = copy.deepcopy(self.g)
+                self._log = []
                 
             else:
                 self.T_check //= 2
-                self.g = copy.deepcopy(self.G)
-                self.n_trans = nx.transitivity(self.g)
-                self.edgelist = list(self.g.edges)
+                self._rollback()
         else:
             self.t_check += 1
             
     def _delta_triangle(self, r1, r2):
+        """Triangles through the edges at positions r1 and r2 of edgelist."""
         e1 = self.edgelist[r1]
         e2 = self.edgelist[r2]
-        tri = len(set(self.g[e1[0]]) & set(self.g[e1[1]]))
-        tri += len(set(self.g[e2[0]]) & set(self.g[e2[1]]) )
-        
-        if 'n_triads' not in self._aux :
-            self._aux['n_triads'] = sum([n[1] * (n[1] - 1 ) / 2 for n in self.G.degree])
-        
-        return 3 * tri / self._aux['n_triads']
+        return self._triangles(*e1) + self._triangles(*e2)
     
     def sample(self, n_trails = 100):
         n_e = len(self.edgelist)
@@ -91,34 +150,47 @@ class Sampler(object):
             e2 = self.edgelist[r2]
             
             if (len(set(e1 + e2)) == 4 
-                and not self.g.has_edge(e1[0], e2[1]) 
-                and not self.g.has_edge(e2[0], e1[1]) ):
+                and not self.has_edge(e1[0], e2[1]) 
+                and not self.has_edge(e2[0], e1[1]) ):
                 return r1, r2, True
             
         return r1, r2, False
         
     def swap(self, r1, r2):
-        e1 = copy.deepcopy(self.edgelist[r1])
-        e2 = copy.deepcopy(self.edgelist[r2])
-        
-        self.g.remove_edge(e1[0], e1[1])
-        self.g.remove_edge(e2[0], e2[1])
-        
-        self.g.add_edge(e1[0], e2[1])
-        self.g.add_edge(e2[0], e1[1])
+        (a, b), (c, d) = self.edgelist[r1], self.edgelist[r2]
+        # (a, b), (c, d) -> (a, d), (c, b); swapping the same positions again undoes it
+        self.adj[a] ^= (1 << b) | (1 << d)
+        self.adj[b] ^= (1 << a) | (1 << c)
+        self.adj[c] ^= (1 << d) | (1 << b)
+        self.adj[d] ^= (1 << c) | (1 << a)
+        self.nbrs[a] ^= {b, d}
+        self.nbrs[b] ^= {a, c}
+        self.nbrs[c] ^= {d, b}
+        self.nbrs[d] ^= {c, a}
 
-        self.edgelist[r1] = (e1[0], e2[1])
-        self.edgelist[r2] = (e2[0], e1[1])
+        self.edgelist[r1] = (a, d)
+        self.edgelist[r2] = (c, b)
         
-    def tune(self, target, std = 10, T_max = 10000):
-        self.g = copy.deepcopy(self.G)
-        self.edgelist = list(self.g.edges)
-        self.n_trans = nx.transitivity(self.g)
+    def tune(self, target, std = 10, T_max = 10000, connectivity = "check"):
+        """
+        connectivity="check" lets swaps disconnect the graph and checks it
+        on an adaptive schedule, undoing the swaps since the last good check
+        when it fails. connectivity="preserve" rejects a disconnecting swap
+        straight away: after (a, b), (c, d) -> (a, d), (c, b) the graph is
+        still connected iff a and b are, so one local search decides it and
+        nothing is ever undone.
+        """
+        if connectivity not in ("check", "preserve"):
+            raise ValueError(f"Unknown connectivity mode {connectivity!r}, expected 'check' or 'preserve'")
+        # start from the last graph known to be connected
+        self._rollback()
         
         n_trials = 100
+        start = time.perf_counter()
+        self.n_accepted = 0
         
         t = 0
-        while t < T_max * len(self.g):
+        while t < T_max * self.n:
             assert n_trials < 1e5
             
             ### edgeswap
@@ -126,14 +198,24 @@ class Sampler(object):
             if sucess:
                 delta = -self._delta_triangle(r1, r2)
                 self.swap(r1, r2)
-                delta += self._delta_triangle(r1, r2)
-                
-                dist = (self.n_trans + delta - target) ** 2 - (self.n_trans - target) ** 2
-                log_ratio = (-dist / 2 * std ** 2)
-                if random.random() > np.exp(min(0, log_ratio)):
+                # (a, b), (c, d) are now (a, d), (c, b)
+                a, b = self.edgelist[r1][0], self.edgelist[r2][1]
+                if connectivity == "preserve" and not self._connected(a, b):
                     self.swap(r1, r2)
                 else:
-                    self.n_trans += delta
+                    delta += self._delta_triangle(r1, r2)
+                    
+                    n_trans = 3 * (self.n_triangles + delta) / self.n_triads
+                    dist = (n_trans - target) ** 2 - (self.n_trans - target) ** 2
+                    log_ratio = (-dist / 2 * std ** 2)
+                    if random.random() > np.exp(min(0, log_ratio)):
+                        self.swap(r1, r2)
+                    else:
+                        self.n_triangles += delta
+                        self.n_trans = n_trans
+                        self.n_accepted += 1
+                        if connectivity == "check":
+                            self._log.append((r1, r2, delta))
                 t += 1
                 
                 n_trials = (n_trials + 1) // 2
@@ -142,29 +224,33 @@ class Sampler(object):
                 
                 
             ### check connectivity
-            self._check_connectivity()
-            if t % len(self.g) == 0:
+            if connectivity == "check":
+                self._check_connectivity()
+            if t % self.n == 0:
                 std = min(1e7, 1.002 * std)
-                print("%d out of %d iterations" % (t // len(self.g), T_max))
+                print("%d out of %d iterations" % (t // self.n, T_max))
                 amp, acc = self.amplification_and_acceleration()
                 print(acc)
+                self._report(start)
                 
-            if np.isclose(self.n_trans, target, rtol=1e-03) and t > (100 * len(self.g)):
+            if np.isclose(self.n_trans, target, rtol=1e-03) and t > (100 * self.n):
                 print("Target reached prematurely.")
                 break
             
-        self.t_check = self.T_check
-        self._check_connectivity()
+        if connectivity == "check":
+            self.t_check = self.T_check
+            self._check_connectivity()
+        self._report(start)
         
-        #print(self.n_trans, nx.transitivity(self.G), nx.transitivity(self.g))
+        #print(self.n_trans, nx.transitivity(self.G))
 
-def main(degree, n, target, out_file):
+def main(degree, n, target, out_file, connectivity="check"):
     sampler = Sampler(degree, n)
-    sampler.tune(target)
+    sampler.tune(target, connectivity=connectivity)
     nx.write_edgelist(sampler.G, out_file, data=False)
 
 if __name__ == "__main__":
-    main(int(sys.argv[1]), int(sys.argv[2]), float(sys.argv[3]), sys.argv[4])
+    main(int(sys.argv[1]), int(sys.argv[2]), float(sys.argv[3]), sys.argv[4], *sys.argv[5:6])
 
 
 
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from checkpoint import truncate_partial_line
+
+
+def job_hash(input_file, executable, trials, s_values):
+    """sha1 of the graph file's bytes and every argument that changes the output."""
+    digest = hashlib.sha1(Path(input_file).read_bytes())
+    digest.update(json.dumps([executable, int(trials), [float(s) for s in s_values]]).encode())
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_file):
+    """{output file: last manifest row} from the JSON lines written by run_batch."""
+    rows = {}
+    manifest_file = Path(manifest_file)
+    if not manifest_file.exists():
+        return rows
+    with open(manifest_file, "r") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                # half-written last line from an interrupted run
+                continue
+            rows[row["output"]] = row
+    return rows
+
+
+def _read_rows(output_file, n_rows):
+    # every output row is (s, extinct, fixed, time_extinct, time_fixed, rt);
+    # None unless all n_rows rows were written
+    try:
+        with warnings.catch_warnings():
+            # an empty file is reported through the shape check below
+            warnings.simplefilter("ignore")
+            rows = np.loadtxt(output_file, delimiter="\t", ndmin=2)
+    except (OSError, ValueError):
+        return None
+    return rows if rows.shape == (n_rows, 6) else None
+
+
+def success_codes(executable):
+    """Exit codes of a successful run: Evograph's main returns 1 even on success."""
+    return (0, 1) if Path(shlex.split(executable)[0]).name == "main" else (0,)
+
+
+def _run_job(command, input_file, output_file, trials, s_values, retries):
+    args = shlex.split(command) + [str(input_file), str(output_file), str(trials)] + [str(s) for s in s_values]
+    codes = success_codes(command)
+    start = time.perf_counter()
+    for attempt in range(1, retries + 2):
+        # a stale output of the right shape must not pass for this run's
+        Path(output_file).unlink(missing_ok=True)
+        try:
+            result = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        except OSError as e:
+            # missing or unexecutable command: no point retrying
+            returncode, error, rows = None, f"{type(e).__name__}: {e}", None
+            break
+        returncode, error = result.returncode, result.stderr[-2000:]
+        # a job is judged by its exit code and its output: one Bd and one dB
+        # row for every s
+        rows = _read_rows(output_file, 2 * len(s_values)) if returncode in codes else None
+        if rows is not None:
+            break
+    seconds = time.perf_counter() - start
+    row = {
+        "input": str(input_file),
+        "output": str(output_file),
+        "family": Path(input_file).parent.name,
+        "status": "ok" if rows is not None else "failed",
+        "returncode": returncode,
+        "attempts": attempt,
+        "seconds": seconds,
+    }
+    if rows is not None:
+        row["trials"] = int(rows[:, 1:3].sum())
+        row["trials_per_sec"] = row["trials"] / seconds if seconds > 0 else np.nan
+    else:
+        row["error"] = error
+    return row
+
+
+def run_batch(
+    input_dir="random_geometric",
+    trials=100000,
+    s_values=(0.001,),
+    output_root="amp_acc",
+    executable="./main",
+    manifest_file=None,
+    max_workers=None,
+    retries=2
+):
+    """
+    Run executable (./main, or e.g. "python3 moran.py") on every
+    input_dir/*.txt graph with the arguments amp_acc.sh passes, writing to
+    output_root/<input_dir name>/<graph>.txt, on a pool of max_workers
+    concurrent jobs (default one per core).
+
+    Every finished job appends a JSON line to manifest_file (default
+    output_root/manifest.jsonl) with its content hash, status, attempts,
+    wall time and trials per second. A job is skipped when the manifest has
+    a successful row for the same output with the same hash of graph bytes,
+    executable, trials and s values and the output file still exists, so an
+    interrupted batch resumes and changed graphs rerun. A job has succeeded
+    when its output holds a Bd and a dB row for every s; failed jobs are
+    retried up to retries times before being recorded as failed; a command
+    that cannot be started is recorded as failed straight away.
+    """
+    input_dir = Path(input_dir)
+    # only the folder name, so an absolute input_dir cannot point the
+    # output back at the graphs themselves
+    output_dir = Path(output_root) / input_dir.resolve().name
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_file = Path(manifest_file) if manifest_file is not None else Path(output_root) / "manifest.jsonl"
+    s_values = list(s_values)
+
+    done = load_manifest(manifest_file)
+    # rows appended below must not be glued onto a half-written last line
+    truncate_partial_line(manifest_file)
+    jobs = []
+    for input_file in sorted(input_dir.glob("*.txt")):
+        output_file = output_dir / input_file.name
+        if output_file.resolve() == input_file.resolve():
+            raise ValueError(f"Output {output_file} would overwrite its input graph")
+        digest = job_hash(input_file, executable, trials, s_values)
+        previous = done.get(str(output_file))
+        if previous and previous["status"] == "ok" and previous["hash"] == digest and output_file.exists():
+            continue
+        jobs.append((input_file, output_file, digest))
+    print(f"{len(jobs)} of {len(list(input_dir.glob('*.txt')))} graphs in {input_dir} to run with {executable}")
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool, open(manifest_file, "a") as out:
+        futures = {
+            pool.submit(_run_job, executable, input_file, output_file, trials, s_values, retries): digest
+            for input_file, output_file, digest in jobs
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            row = future.result()
+            row.update({"hash": futures[future], "executable": executable, "trials_arg": trials, "s": s_values})
+            out.write(json.dumps(row) + "\n")
+            out.flush()
+            failed += row["status"] != "ok"
+            rate = f", {row['trials_per_sec']:.0f} trials/s" if row["status"] == "ok" else ""
+            print(f"{i}/{len(jobs)} {row['status']}: {Path(row['input']).name} in {row['seconds']:.1f}s{rate}")
+
+    if failed:
+        print(f"{failed} jobs failed, see {manifest_file}")
+    return manifest_file
+
+
+def summarize_manifest(manifest_file="amp_acc/manifest.jsonl"):
+    """Jobs, failures, wall time and trials per second by graph family, slowest first."""
+    df = pd.DataFrame(list(load_manifest(manifest_file).values()))
+    if df.empty:
+        return df
+    df["ok"] = df["status"] == "ok"
+    if "trials" not in df:
+        df["trials"] = np.nan
+    summary = df.groupby("family").agg(
+        jobs=("output", "count"),
+        failed=("ok", lambda ok: int((~ok).sum())),
+        seconds=("seconds", "sum"),
+        trials=("trials", "sum"),
+    )
+    summary["trials_per_sec"] = summary["trials"] / summary["seconds"]
+    return summary.sort_values("trials_per_sec")
+
+
+if __name__ == "__main__":
+    # python amp_acc.py [input_dir] [trials] [s ...] [--executable=CMD] [--workers=K] [--retries=R]
+    options = dict(a[2:].partition("=")[::2] for a in sys.argv[1:] if a.startswith("--"))
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    run_batch(
+        args[0] if args else "random_geometric",
+        int(args[1]) if len(args) > 1 else 100000,
+        [float(s) for s in args[2:]] or [0.001],
+        executable=options.get("executable", "./main"),
+        max_workers=int(options["workers"]) if "workers" in options else None,
+        retries=int(options.get("retries", 2))
+    )
+    print(summarize_manifest(Path("amp_acc") / "manifest.jsonl"))
@@ -0,0 +1,72 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+def _to_json(value):
+    # NumPy scalars and arrays, e.g. parameters taken from a parameter array
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def save_checkpoint(path, arrays, state, rng):
+    """
+    Atomically write simulation arrays, a JSON-serialisable state dict
+    (NumPy scalars and arrays in it become Python values) and the
+    bit-generator state of rng to path (.npz). The file is written next to
+    path and renamed over it, so a crash mid-write leaves the previous
+    checkpoint intact.
+    """
+    path = Path(path)
+    state = dict(state, rng=rng.bit_generator.state)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, state=np.array(json.dumps(state, default=_to_json)), **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    """
+    Read a checkpoint written by save_checkpoint. Returns the arrays, the
+    state dict and a Generator positioned exactly where the run stopped.
+    """
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files if name != "state"}
+        state = json.loads(str(data["state"]))
+
+    rng_state = state.pop("rng")
+    bit_generator = getattr(np.random, rng_state["bit_generator"])()
+    bit_generator.state = rng_state
+    return arrays, state, np.random.Generator(bit_generator)
+
+
+def truncate_partial_line(path):
+    """
+    Cut a line-oriented log (e.g. JSON lines) back to its last complete
+    line, so rows appended after a crash mid-write start on a line of their
+    own instead of being glued onto the half-written one.
+    """
+    path = Path(path)
+    if not path.exists():
+        return
+    with open(path, "r+b") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 4096)
+            f.seek(start)
+            block = f.read(position - start)
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            f.truncate(position)
@@ -0,0 +1,163 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+class ColumnStore(object):
+    """
+    Append-only columnar table stored as a directory with one raw binary file
+    per column and a schema.json.
+
+    Numeric columns are little-endian int64/float64 files that can be
+    memory-mapped; string columns are dictionary encoded as int32 codes. Rows
+    are only ever appended, so a reader never has to rewrite the table, and
+    read() loads just the columns it is asked for, filtering rows on the
+    `where` columns before touching the others.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._schema_file = self.path / "schema.json"
+        if self._schema_file.exists():
+            with open(self._schema_file, "r") as f:
+                schema = json.load(f)
+        else:
+            schema = {"columns": {}, "dictionaries": {}}
+        self.columns = schema["columns"]
+        self.dictionaries = schema["dictionaries"]
+        self._codes = {name: {v: i for i, v in enumerate(values)} for name, values in self.dictionaries.items()}
+
+    def __len__(self):
+        if not self.columns:
+            return 0
+        # a crash between column writes can leave some columns one row longer
+        return min(self._rows(name) for name in self.columns)
+
+    def _file(self, name):
+        return self.path / f"{name}.bin"
+
+    def _storage_dtype(self, name):
+        dtype = self.columns[name]
+        return np.dtype("<i4") if dtype == "str" else np.dtype(dtype).newbyteorder("<")
+
+    def _rows(self, name):
+        file = self._file(name)
+        return file.stat().st_size // self._storage_dtype(name).itemsize if file.exists() else 0
+
+    def _write_schema(self):
+        tmp = self._schema_file.with_name("schema.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"columns": self.columns, "dictionaries": self.dictionaries}, f)
+        os.replace(tmp, self._schema_file)
+
+    def _add_column(self, name, values, existing):
+        if values.dtype.kind in "OUS":
+            self.columns[name] = "str"
+            self.dictionaries[name] = []
+            self._codes[name] = {}
+        elif values.dtype.kind in "biu":
+            self.columns[name] = "int64"
+        else:
+            self.columns[name] = "float64"
+        # rows appended before this column existed read back as missing
+        self._missing(name, existing).tofile(self._file(name))
+
+    def _missing(self, name, n):
+        fill = -1 if self.columns[name] in ("str", "int64") else np.nan
+        return np.full(n, fill).astype(self._storage_dtype(name))
+
+    def _encode(self, name, values):
+        codes = self._codes[name]
+        new = False
+        out = np.empty(len(values), dtype="<i4")
+        for i, v in enumerate(values.tolist()):
+            v = str(v)
+            if v not in codes:
+                codes[v] = len(self.dictionaries[name])
+                self.dictionaries[name].append(v)
+                new = True
+            out[i] = codes[v]
+        return out, new
+
+    def append(self, row):
+        """Append one row given as {column: scalar}."""
+        self.extend({name: [value] for name, value in row.items()})
+
+    def extend(self, columns):
+        """Append several rows given as {column: sequence}, all the same length."""
+        columns = {name: np.asarray(values) for name, values in columns.items()}
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) != 1:
+            raise ValueError(f"Columns have different lengths: {lengths}")
+        n = lengths.pop()
+
+        start = len(self)
+        schema_changed = False
+        for name, values in columns.items():
+            if name not in self.columns:
+                self._add_column(name, values, start)
+                schema_changed = True
+
+        encoded = {}
+        for name in self.columns:
+            if name not in columns:
+                encoded[name] = self._missing(name, n)
+            elif self.columns[name] == "str":
+                encoded[name], new = self._encode(name, columns[name])
+                schema_changed = schema_changed or new
+            else:
+                encoded[name] = columns[name].astype(self._storage_dtype(name))
+
+        # dictionary entries must be on disk before codes refer to them
+        if schema_changed:
+            self._write_schema()
+        for name, values in encoded.items():
+            with open(self._file(name), "r+b" if self._file(name).exists() else "wb") as f:
+                # drop a partial row left by a crash before appending
+                f.truncate(start * values.itemsize)
+                f.seek(0, os.SEEK_END)
+                values.tofile(f)
+
+    def column(self, name):
+        """Memory-mapped raw values (codes for string columns) of one column."""
+        n = len(self)
+        if n == 0:
+            return np.empty(0, dtype=self._storage_dtype(name))
+        return np.memmap(self._file(name), dtype=self._storage_dtype(name), mode="r", shape=(n,))
+
+    def _decode(self, name, values):
+        if self.columns[name] != "str":
+            return np.asarray(values)
+        dictionary = np.array(self.dictionaries[name] + [None], dtype=object)
+        return dictionary[values]
+
+    def read(self, columns=None, where=None):
+        """
+        Read the table into a DataFrame.
+
+        columns limits which columns are loaded. where maps column names to a
+        value, a list of accepted values or a function of the column array
+        returning a boolean mask; rows are filtered on those columns first
+        and only the matching rows of the other columns are read.
+        """
+        columns = list(self.columns) if columns is None else list(columns)
+        mask = np.ones(len(self), dtype=bool)
+        for name, condition in (where or {}).items():
+            raw = self.column(name)
+            if callable(condition):
+                mask &= np.asarray(condition(self._decode(name, raw)), dtype=bool)
+                continue
+            accepted = condition if isinstance(condition, (list, tuple, set)) else [condition]
+            if self.columns[name] == "str":
+                # values are stored as str(value), so look them up the same way
+                codes = [self._codes[name][str(v)] for v in accepted if str(v) in self._codes[name]]
+                mask &= np.isin(raw, codes)
+            else:
+                mask &= np.isin(raw, list(accepted))
+
+        rows = np.flatnonzero(mask)
+        return pd.DataFrame({name: self._decode(name, self.column(name)[rows]) for name in columns})
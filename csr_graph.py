@@ -0,0 +1,175 @@
+import numpy as np
+
+
+class CSRGraph(object):
+    """
+    Undirected graph on nodes 0..n-1 stored as CSR arrays: the neighbours of
+    node u are indices[indptr[u]:indptr[u + 1]], sorted, and every edge is
+    stored in both directions. A networkx view is only built on request.
+    """
+
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_edges(cls, edges, n=None):
+        """
+        Build from an (m, 2) array of undirected edges. Duplicate edges are
+        merged; n defaults to the largest node id + 1.
+        """
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        if n is None:
+            n = int(edges.max()) + 1 if len(edges) else 0
+        both = np.concatenate([edges, edges[:, ::-1]])
+        # sort by (source, target) and drop repeats with a single key
+        keys = np.unique(both[:, 0] * n + both[:, 1])
+        src, dst = np.divmod(keys, n)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        return cls(indptr, dst.astype(np.int32))
+
+    @classmethod
+    def from_networkx(cls, G):
+        """Graph with integer nodes 0..n-1, e.g. from a networkx generator."""
+        return cls.from_edges(np.array(G.edges(), dtype=np.int64), G.number_of_nodes())
+
+    @property
+    def n(self):
+        return len(self.indptr) - 1
+
+    def degrees(self):
+        return np.diff(self.indptr)
+
+    def number_of_edges(self):
+        loops = np.count_nonzero(self.indices == self.sources())
+        return (len(self.indices) + loops) // 2
+
+    def degree_assortativity(self):
+        """
+        Pearson correlation of the degrees at the two ends of every edge,
+        nx.degree_assortativity_coefficient for graphs without self-loops.
+        """
+        degrees = self.degrees().astype(np.float64)
+        return float(np.corrcoef(degrees[self.sources()], degrees[self.indices])[0, 1])
+
+    def transitivity(self):
+        """
+        3 * triangles / connected triples, as nx.transitivity. Every
+        triangle is counted once per corner through (A @ A) * A.
+        """
+        from scipy.sparse import csr_matrix
+
+        A = csr_matrix((np.ones(len(self.indices)), self.indices, self.indptr), shape=(self.n, self.n))
+        A.setdiag(0)
+        A.eliminate_zeros()
+        closed = A.multiply(A @ A).sum()
+        degrees = np.diff(A.indptr).astype(np.float64)
+        triples = float(np.sum(degrees * (degrees - 1)))
+        return float(closed) / triples if closed else 0.0
+
+    def neighbors(self, u):
+        return self.indices[self.indptr[u]:self.indptr[u + 1]]
+
+    def sources(self):
+        """Source node of every stored (directed) entry of indices."""
+        return np.repeat(np.arange(self.n, dtype=np.int32), self.degrees())
+
+    def edges(self):
+        """(m, 2) array of undirected edges with u <= v."""
+        src = self.sources()
+        keep = src <= self.indices
+        return np.column_stack([src[keep], self.indices[keep]])
+
+    def save_edge_list(self, filename):
+        """Write "u v" lines, the format read by nx.read_edgelist and the simulators."""
+        np.savetxt(filename, self.edges(), fmt="%d")
+
+    def to_networkx(self):
+        import networkx as nx
+
+        G = nx.Graph()
+        G.add_nodes_from(range(self.n))
+        G.add_edges_from(self.edges().tolist())
+        return G
+
+
+def read_edge_list(filename):
+    """
+    Parse a "u v" per line text edge list. As with nx.read_edgelist the
+    nodes are only the ids that appear in an edge: node i is the i-th
+    smallest of them, so files labelled 0..n-1, like all the generated
+    ones, keep their ids, and gaps in the labelling do not become isolated
+    nodes.
+    """
+    edges = np.loadtxt(filename, dtype=np.int64, usecols=(0, 1), ndmin=2, comments="#")
+    ids = np.unique(edges)
+    if len(ids) and (ids[0] != 0 or ids[-1] != len(ids) - 1):
+        edges = np.searchsorted(ids, edges)
+    return CSRGraph.from_edges(edges, len(ids))
+
+
+def grid_edges(height, width):
+    """Edges of a height x width grid, node i * width + j at row i, column j."""
+    node = np.arange(height * width).reshape(height, width)
+    horizontal = np.column_stack([node[:, :-1].ravel(), node[:, 1:].ravel()])
+    vertical = np.column_stack([node[:-1, :].ravel(), node[1:, :].ravel()])
+    return np.concatenate([horizontal, vertical])
+
+
+def grid(height, width):
+    """grids family: generate_grids.generate_grid."""
+    return CSRGraph.from_edges(grid_edges(height, width), height * width)
+
+
+def fingers(rows, cols, k):
+    """
+    fingers family: all vertical edges of a rows x cols grid plus the
+    horizontal edges of rows 0..k-1 (fingers.generate_grid_generations).
+    """
+    node = np.arange(rows * cols).reshape(rows, cols)
+    horizontal = np.column_stack([node[:k, :-1].ravel(), node[:k, 1:].ravel()])
+    vertical = np.column_stack([node[:-1, :].ravel(), node[1:, :].ravel()])
+    return CSRGraph.from_edges(np.concatenate([horizontal, vertical]), rows * cols)
+
+
+def tree(num_levels, height, width):
+    """
+    trees family: a grid whose rows are split into num_levels bands; band l
+    has its horizontal edges cut at 2**l - 1 evenly spaced columns
+    (generate_tree.generate_tree).
+    """
+    node = np.arange(height * width).reshape(height, width)
+    keep = np.ones((height, width - 1), dtype=bool)
+    level_rows = np.linspace(0, height, num_levels + 1, dtype=int)
+    for level in range(num_levels):
+        step_positions = np.linspace(0, width, 2 ** level + 1, dtype=int)[1:-1]
+        # cutting at column j removes the edge between columns j - 1 and j
+        keep[level_rows[level]:level_rows[level + 1], step_positions - 1] = False
+    horizontal = np.column_stack([node[:, :-1][keep], node[:, 1:][keep]])
+    vertical = np.column_stack([node[:-1, :].ravel(), node[1:, :].ravel()])
+    return CSRGraph.from_edges(np.concatenate([horizontal, vertical]), height * width)
+
+
+def line(n, step):
+    """
+    lines_2 family: a path of n nodes folded at its middle, with cross edges
+    joining the two halves for the step + 1 pairs nearest the fold
+    (generate_line.build_graph_and_save).
+    """
+    path = np.column_stack([np.arange(n - 1), np.arange(1, n)])
+    t = np.arange(step + 1)
+    cross = np.column_stack([n // 2 - 1 - t, n // 2 + t])
+    return CSRGraph.from_edges(np.concatenate([path, cross]), n)
+
+
+def bottleneck(cluster1_edges, cluster2_edges, cluster_size, n_bridges):
+    """
+    bottleneck families: two clusters of cluster_size nodes, the second
+    relabelled to cluster_size.., joined by bridges (i, i + cluster_size)
+    for i < n_bridges (generate_regular_bottlenecks).
+    """
+    cluster1_edges = np.asarray(cluster1_edges, dtype=np.int64).reshape(-1, 2)
+    cluster2_edges = np.asarray(cluster2_edges, dtype=np.int64).reshape(-1, 2) + cluster_size
+    bridges = np.column_stack([np.arange(n_bridges), np.arange(n_bridges) + cluster_size])
+    return CSRGraph.from_edges(np.concatenate([cluster1_edges, cluster2_edges, bridges]), 2 * cluster_size)
@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def _edge_ends(graph, n=None):
+    """(degrees, source, target) with every undirected edge in both directions."""
+    if hasattr(graph, "indptr"):
+        edges = graph.edges()
+        n = graph.n if n is None else n
+    else:
+        edges = np.asarray(graph, dtype=np.int64).reshape(-1, 2)
+        if n is None:
+            n = int(edges.max()) + 1 if len(edges) else 0
+    source = np.concatenate([edges[:, 0], edges[:, 1]])
+    target = np.concatenate([edges[:, 1], edges[:, 0]])
+    degrees = np.bincount(source, minlength=n)
+    return degrees, source, target
+
+
+def degree_correlation(graph, n=None):
+    """
+    Degree-correlation matrix over the distinct degrees present.
+
+    graph is a CSRGraph or an (m, 2) edge array on nodes 0..n-1. Returns
+    (k, p, corr): the distinct non-zero degrees, the fraction of nodes with
+    each, and corr[i, j] = sum over edge ends x -> y with deg x = k[i] and
+    deg y = k[j] of 1 / (count(k[i]) * k[i]). Memory is O(len(k)**2).
+    """
+    degrees, source, target = _edge_ends(graph, n)
+    N = len(degrees)
+    k, inverse, counts = np.unique(degrees, return_inverse=True, return_counts=True)
+    i, j = inverse[source], inverse[target]
+    D = len(k)
+    weights = 1.0 / (counts[i] * k[i])
+    corr = np.bincount(i * D + j, weights=weights, minlength=D * D).reshape(D, D)
+
+    p = counts / N
+    # isolated nodes take no part in the dynamics
+    keep = k > 0
+    return k[keep], p[keep], corr[np.ix_(keep, keep)]
+
+
+def amplification_and_acceleration(graph, n=None):
+    """
+    Degree-class estimates of amplification and acceleration (the values
+    Triangle_sampling.Sampler prints while tuning), for a CSRGraph or an
+    (m, 2) edge array.
+    """
+    k, p, corr = degree_correlation(graph, n)
+    if len(k) == 0:
+        return np.nan, np.nan
+
+    flow = p @ corr
+    inverse_k2 = flow @ (1.0 / k ** 2)
+    amp = flow @ (1.0 / k) / inverse_k2 * (p / k).sum()
+    acc = inverse_k2 / (p / k).sum() ** 2
+    return float(amp), float(1 / acc)
@@ -1,7 +1,6 @@
 from pathlib import Path
 from collections import defaultdict
 import numpy as np
-from scipy.optimize import fsolve
 
 # Parameters
 N = 1000
@@ -26,7 +25,6 @@ INPUT_DIRS = [
 
 # Output base directory
 OUTPUT_BASE = Path("amp_acc/amplification")
-OUTPUT_BASE.mkdir(parents=True, exist_ok=True)
 
 
 def parse_type(path: Path) -> str:
@@ -37,34 +35,142 @@ def parse_type(path: Path) -> str:
     return path.stem.split("_", 1)[1]
 
 
-def amplification(filepath: Path) -> float:
+def _log_fixation(x, N):
+    """
+    log of (1 - e^-x) / (1 - e^(-x N)), the fixation probability with
+    x = alpha * log(1 + s), evaluated without overflow for large |x|.
+    """
+    x = np.asarray(x, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        positive = np.log(-np.expm1(-x)) - np.log(-np.expm1(-x * N))
+        y = -x
+        negative = (y + np.log1p(-np.exp(-y))) - (N * y + np.log1p(-np.exp(-N * y)))
+    return np.where(x > 0, positive, np.where(x < 0, negative, -np.log(N)))
+
+
+def _log_fixation_slope(x, N):
+    # d/dx of _log_fixation; its limit at x = 0 is (N - 1) / 2
+    x = np.asarray(x, dtype=float)
+    small = np.abs(x) < 1e-8
+    safe = np.where(small, 1.0, x)
+    with np.errstate(over="ignore"):
+        slope = 1 / np.expm1(safe) - N / np.expm1(N * safe)
+    return np.where(small, (N - 1) / 2, slope)
+
+
+def solve_alpha(probability, s=s, N=N, tol=1e-12, maxiter=200):
     """
-    Compute alpha for a single run file.
+    alpha with (1 - (1 + s)^-alpha) / (1 - (1 + s)^(-alpha N)) equal to the
+    fixation probability, for a scalar or elementwise for arrays of
+    probability, s and N (broadcast together).
+
+    All values are solved at once by safeguarded Newton iterations on the
+    log of the formula, which is increasing in alpha: each root is kept
+    inside a bracket that is first widened by doubling, and a step leaving
+    the bracket is replaced by bisection. Probabilities of 0 and 1 give
+    -inf and inf.
     """
-    data = []
+    probability, s_values, N_values = np.broadcast_arrays(
+        np.asarray(probability, dtype=float), np.asarray(s, dtype=float), np.asarray(N, dtype=float)
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        target = np.log(probability)
+        guess = np.log(probability * N_values) * 2 / np.maximum(N_values - 1, 1)
+    scale = np.log1p(s_values)
+
+    def h(x):
+        return _log_fixation(x, N_values) - target
+
+    # bracket the root in x = alpha * log(1 + s)
+    lo = np.full(probability.shape, -1.0)
+    hi = np.full(probability.shape, 1.0)
+    inside = (probability > 0) & (probability < 1)
+    for _ in range(64):
+        low_high = inside & (h(lo) > 0)
+        high_low = inside & (h(hi) < 0)
+        if not (low_high.any() or high_low.any()):
+            break
+        lo = np.where(low_high, 2 * lo, lo)
+        hi = np.where(high_low, 2 * hi, hi)
+
+    # start from the linearisation around alpha = 0
+    x = np.clip(guess, lo, hi)
+    x = np.where(np.isfinite(x), x, (lo + hi) / 2)
+    active = inside.copy()
+    for _ in range(maxiter):
+        if not active.any():
+            break
+        value = h(x)
+        lo = np.where(active & (value < 0), x, lo)
+        hi = np.where(active & (value > 0), x, hi)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = x - value / _log_fixation_slope(x, N_values)
+        bad = ~np.isfinite(step) | (step <= lo) | (step >= hi)
+        step = np.where(bad, (lo + hi) / 2, step)
+        converged = (np.abs(step - x) <= tol * np.maximum(1.0, np.abs(x))) | (value == 0)
+        x = np.where(active, step, x)
+        active &= ~converged
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        alpha = x / scale
+    alpha = np.where(probability <= 0, -np.inf, np.where(probability >= 1, np.inf, alpha))
+    alpha = np.where(np.isnan(probability) | (scale == 0), np.nan, alpha)
+    return alpha if alpha.ndim else float(alpha)
+
+
+def wilson_interval(fixed, trials, z=1.96):
+    """Wilson score interval (low, high) of a binomial proportion fixed / trials."""
+    fixed = np.asarray(fixed, dtype=float)
+    trials = np.asarray(trials, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = fixed / trials
+        denominator = 1 + z ** 2 / trials
+        center = (p + z ** 2 / (2 * trials)) / denominator
+        half = z / denominator * np.sqrt(p * (1 - p) / trials + z ** 2 / (4 * trials ** 2))
+    return np.clip(center - half, 0, 1), np.clip(center + half, 0, 1)
+
+
+def amplification_interval(fixed, trials, s=s, N=N, z=1.96):
+    """
+    (alpha, low, high) for fixed fixations out of trials: alpha of the
+    observed probability and the alphas of the ends of its Wilson interval,
+    which bound alpha since the inversion is monotone. Arrays are solved
+    together.
+    """
+    low, high = wilson_interval(fixed, trials, z)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = np.asarray(fixed, dtype=float) / np.asarray(trials, dtype=float)
+    return solve_alpha(p, s, N), solve_alpha(low, s, N), solve_alpha(high, s, N)
 
-    with open(filepath, "r") as f:
-        for line in f:
-            values = [float(v) for v in line.strip().split("\t")]
-            data.append(values)
 
-    data = np.array(data)
-    averages = data.mean(axis=0)
+def evograph_dynamics(k):
+    """
+    Dynamics labels of the k rows of an Evograph (or moran.main) result
+    file, which writes a Bd row for every s and then a dB row for every s;
+    None for an odd k, which a complete file never has.
+    """
+    if k % 2:
+        return None
+    return ["Bd"] * (k // 2) + ["dB"] * (k // 2)
 
-    fixated = averages[2]
-    probability_fixated = fixated / runs
 
-    alpha_guess = 1.0
+def _fixation_probability(filepath: Path) -> float:
+    # Bd rows only, pooled over their trials, as fixation_results.amplification_table
+    data = np.loadtxt(filepath, delimiter="\t", ndmin=2)
+    labels = evograph_dynamics(len(data))
+    if labels is None:
+        print(f"{filepath}: {len(data)} rows, expected a Bd and a dB row for every s; skipped")
+        return np.nan
+    bd = data[np.array(labels) == "Bd"]
+    return bd[:, 2].sum() / (bd[:, 1] + bd[:, 2]).sum()
 
-    def func(alpha):
-        return (
-            (1 - (1 + s) ** (-alpha))
-            / (1 - (1 + s) ** (-alpha * N))
-            - probability_fixated
-        )
 
-    alpha = fsolve(func, alpha_guess)[0]
-    return alpha
+def amplification(filepath: Path) -> float:
+    """
+    Compute alpha for a single run file from its Bd rows, the same
+    amplification fixation_results.amplification_table gives.
+    """
+    return solve_alpha(_fixation_probability(filepath))
 
 
 def process_all_directories():
@@ -76,17 +182,18 @@ def process_all_directories():
         output_dir = OUTPUT_BASE / input_dir.name
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        # Collect alphas by graph type
+        # Collect alphas by graph type, inverting the whole directory at once
+        filepaths = sorted(input_dir.glob("*.txt"))
+        alphas = np.atleast_1d(solve_alpha([_fixation_probability(f) for f in filepaths]))
         alpha_by_type = defaultdict(list)
 
-        for filepath in input_dir.glob("*.txt"):
-            graph_type = parse_type(filepath)
-            alpha = amplification(filepath)
-            alpha_by_type[graph_type].append(alpha)
+        for filepath, alpha in zip(filepaths, alphas):
+            alpha_by_type[parse_type(filepath)].append(alpha)
 
         # Write averaged alpha per graph type
         for graph_type, alphas in alpha_by_type.items():
-            mean_alpha = np.mean(alphas)
+            # incomplete files give nan and are left out
+            mean_alpha = np.nanmean(alphas)
 
             output_file = output_dir / f"{graph_type}.txt"
             with open(output_file, "w") as f:
@@ -1,5 +1,7 @@
 import networkx as nx
 import matplotlib.pyplot as plt
+import csr_graph
+from graph_store import save_graph
 
 
 def save_edge_list_txt(G, filename):
@@ -24,43 +26,22 @@ def plot_grid(G, rows=40, cols=25, title="Grid"):
     plt.savefig(f"fingers_pngs/finger_{i}.png", dpi=300, bbox_inches="tight")
     plt.close()
 
-def generate_grid_generations(rows=40, cols=25):
+def generate_grid_generations(rows=40, cols=25, as_networkx=True):
     """
     Returns a list of graphs.
     Generation k has horizontal edges in rows [0, k-1]
     and all vertical edges present.
+    Graphs are built as CSR arrays; as_networkx=False returns those
+    instead of networkx graphs.
     """
     generations = []
 
-    # Create a mapping: (row, col) -> node integer
-    def node_id(r, c):
-        return r * cols + c
-
-    # Precompute vertical edges (always present)
-    vertical_edges = [
-        (node_id(r, c), node_id(r + 1, c))
-        for r in range(rows - 1)
-        for c in range(cols)
-    ]
-
     for k in range(1, rows + 1):
-        G = nx.Graph()
-        G.add_nodes_from(range(rows * cols))
-
-        # Add all vertical edges
-        G.add_edges_from(vertical_edges)
-
-        # Add horizontal edges for rows 0 through k-1
-        horizontal_edges = [
-            (node_id(r, c), node_id(r, c + 1))
-            for r in range(k)
-            for c in range(cols - 1)
-        ]
-        G.add_edges_from(horizontal_edges)
+        graph = csr_graph.fingers(rows, cols, k)
 
-        generations.append(G)
         filename = f"fingers/finger_{k}.txt"
-        save_edge_list_txt(G, filename)
+        save_graph(graph, filename)
+        generations.append(graph.to_networkx() if as_networkx else graph)
 
     return generations
 
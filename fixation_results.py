@@ -0,0 +1,160 @@
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from columnar import ColumnStore
+from find_amplification import amplification_interval, evograph_dynamics
+
+# one row per simulator output line: a (graph, s, replicate) batch of trials
+RESULTS_DIR = "results/fixation"
+KEY = ["graph_type", "graph_name", "s", "replicate"]
+
+
+def record(store, graph_type, graph_name, row, n, dynamics="Bd", replicate=0):
+    """
+    Append one simulator row (s, extinct, fixed, time_extinct, time_fixed,
+    rt), as returned by moran.simulate or written by Simulator::save, for a
+    graph of n nodes. dynamics is "Bd", "dB" or "wm" (the well-mixed
+    reference runs acceleration is measured against).
+    """
+    s, extinct, fixed, time_extinct, time_fixed, rt = row
+    store.append({
+        "graph_type": graph_type,
+        "graph_name": graph_name,
+        "s": float(s),
+        "replicate": int(replicate),
+        "dynamics": dynamics,
+        "n": int(n),
+        "extinct": int(extinct),
+        "fixed": int(fixed),
+        "time_extinct": float(time_extinct),
+        "time_fixed": float(time_fixed),
+        "rt": float(rt),
+    })
+
+
+def _parse_stem(stem):
+    # "12_PA_3" -> replicate 12 of graph "PA_3", as find_amplification names them
+    match = re.fullmatch(r"(\d+)_(.+)", stem)
+    return (match.group(2), int(match.group(1))) if match else (stem, 0)
+
+
+def import_text(results_root, store_path=RESULTS_DIR, dynamics=None, n=1000, graph_types=None):
+    """
+    Append every results_root/<graph_type>/*.txt file of tab-separated
+    simulator rows to the store, one row per line. Files named
+    <replicate>_<graph_name>.txt keep their replicate number.
+
+    With dynamics None the files are taken to be Evograph's (or
+    moran.main's): a Bd row for every s, then a dB row for every s, so the
+    first half of the rows is labelled "Bd" and the rest "dB", and files
+    with an odd number of rows are skipped as incomplete. Otherwise every
+    row gets that label (e.g. "wm" for the well-mixed reference runs).
+
+    Every row keeps the file it came from in a source column, and files
+    already in the store are skipped, so rerunning an import only adds the
+    new files.
+    """
+    results_root = Path(results_root)
+    store = ColumnStore(store_path)
+    imported = set(store.read(["source"])["source"]) if "source" in store.columns else set()
+    if graph_types is None:
+        graph_types = sorted(p.name for p in results_root.iterdir() if p.is_dir())
+
+    for graph_type in graph_types:
+        columns = {name: [] for name in KEY + ["dynamics", "n", "extinct", "fixed", "time_extinct", "time_fixed", "rt", "source"]}
+        skipped = 0
+        for path in sorted((results_root / graph_type).glob("*.txt")):
+            source = str(path.resolve())
+            if source in imported:
+                skipped += 1
+                continue
+            rows = np.loadtxt(path, delimiter="\t", ndmin=2)
+            if rows.size == 0:
+                continue
+            k = len(rows)
+            labels = evograph_dynamics(k) if dynamics is None else [dynamics] * k
+            if labels is None:
+                print(f"{path}: {k} rows, expected a Bd and a dB row for every s; skipped")
+                continue
+            graph_name, replicate = _parse_stem(path.stem)
+            columns["graph_type"] += [graph_type] * k
+            columns["graph_name"] += [graph_name] * k
+            columns["replicate"] += [replicate] * k
+            columns["dynamics"] += labels
+            columns["n"] += [n] * k
+            columns["source"] += [source] * k
+            columns["s"].extend(rows[:, 0])
+            columns["extinct"].extend(rows[:, 1].astype(np.int64))
+            columns["fixed"].extend(rows[:, 2].astype(np.int64))
+            columns["time_extinct"].extend(rows[:, 3])
+            columns["time_fixed"].extend(rows[:, 4])
+            columns["rt"].extend(rows[:, 5] if rows.shape[1] > 5 else np.full(k, np.nan))
+        if columns["s"]:
+            store.extend(columns)
+        print(f"{graph_type}: {len(columns['s'])} rows, {skipped} files already imported")
+    return store
+
+
+def read_results(store_path=RESULTS_DIR, **where):
+    """
+    The result rows as a DataFrame, filtered on any columns given as
+    keyword arguments (a value, a list of values or a predicate), e.g.
+    read_results(graph_type="grids", s=0.001). Only the matching rows of
+    the other columns are read.
+    """
+    return ColumnStore(store_path).read(where=where)
+
+
+def amplification_table(store_path=RESULTS_DIR, z=1.96, **where):
+    """
+    Amplification of every (graph_type, graph_name, s) in the store: the
+    alpha solving the fixation probability of its Bd rows, pooled over
+    rows, with amp_low/amp_high from the Wilson interval of the pooled
+    binomial count (find_amplification.amplification_interval). This is the
+    amplification find_amplification.amplification computes from a text
+    result file.
+    """
+    df = read_results(store_path, dynamics="Bd", **where)
+    if df.empty:
+        return pd.DataFrame(columns=["graph_type", "graph_name", "s", "amp", "amp_low", "amp_high"])
+    df["trials"] = df["extinct"] + df["fixed"]
+    pooled = df.groupby(["graph_type", "graph_name", "s"], as_index=False, sort=False).agg(
+        fixed=("fixed", "sum"), trials=("trials", "sum"), n=("n", "first")
+    )
+    amp, low, high = amplification_interval(
+        pooled["fixed"].to_numpy(), pooled["trials"].to_numpy(), pooled["s"].to_numpy(), pooled["n"].to_numpy(), z
+    )
+    pooled["amp"], pooled["amp_low"], pooled["amp_high"] = amp, low, high
+    return pooled.drop(columns=["fixed", "trials", "n"])
+
+
+def acceleration_table(store_path=RESULTS_DIR, **where):
+    """
+    Acceleration of every (graph_type, graph_name, s) with both Bd and
+    well-mixed ("wm") rows: the mean well-mixed fixation time over the mean
+    fixation time on the graph.
+    """
+    df = read_results(store_path, dynamics=["Bd", "wm"], **where)
+    times = df.pivot_table(
+        index=["graph_type", "graph_name", "s"], columns="dynamics", values="time_fixed", aggfunc="mean"
+    )
+    if "Bd" not in times or "wm" not in times:
+        return pd.DataFrame(columns=["graph_type", "graph_name", "s", "acc"])
+    times["acc"] = times["wm"] / times["Bd"]
+    return times["acc"].dropna().reset_index()
+
+
+def amp_acc_table(store_path=RESULTS_DIR, **where):
+    """amp and acc side by side, one row per (graph_type, graph_name, s)."""
+    return amplification_table(store_path, **where).merge(
+        acceleration_table(store_path, **where), on=["graph_type", "graph_name", "s"], how="outer"
+    )
+
+
+if __name__ == "__main__":
+    # python fixation_results.py amp_acc/graphs [wm]
+    import_text(sys.argv[1], dynamics=sys.argv[2] if len(sys.argv) > 2 else None)
@@ -1,4 +1,6 @@
 import networkx as nx
+from csr_graph import CSRGraph
+from graph_store import save_graph
 from scipy.stats import pareto
 import math, random
 import sys
@@ -11,7 +13,7 @@ def geometric_random(r):
         G = nx.random_geometric_graph(n, radius = r)
         while(not nx.is_connected(G)): 
             G = nx.random_geometric_graph(n, radius = r)
-        nx.write_edgelist(G, f"random_geometric_1/random_geometric_{r}_{i}.txt", data=False)
+        save_graph(CSRGraph.from_networkx(G), f"random_geometric_1/random_geometric_{r}_{i}.txt")
 
 if __name__ == "__main__":
     for i in range (5, 100):
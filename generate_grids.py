@@ -1,6 +1,8 @@
 import networkx as nx 
 import matplotlib.pyplot as plt 
 import math
+import csr_graph
+from graph_store import save_graph
 
 def generate_network_grid(height=500, width=2):
     edge_dict = {}
@@ -58,33 +60,28 @@ if __name__ == "__main__":
     for height in range (1,int(math.sqrt(n))): 
         if (n/height).is_integer(): 
             width = int(n/height)
-            edge_list = generate_grid(height, width)
-            with open(f"grids/grid_{height}.txt", "w") as f:
-                for n1, n2 in edge_list:
-                    f.write(f"{n1} {n2}\n")
-
-                    G = nx.Graph()
-                    total_nodes = n
-                    G.add_nodes_from(range(total_nodes))   # ensures all nodes are included, even if isolated
-                    G.add_edges_from(edge_list)
-
-                    # grid-based layout
-                pos = {}
-                for i in range(height):
-                    for j in range(width):
-                        node = i * width + j
-                        pos[node] = (j, -i)  # x=j, y=i; negative y to flip vertically
-
-                # Plot
-                plt.figure(figsize=(8, height / 10))  # adjustable scale
-                nx.draw(
-                    G,
-                    pos,
-                    node_size=20,
-                    width=0.5,
-                    with_labels=False
-                )
-
-                plt.savefig(f"pngs/grid_network_level_{height}.png", dpi=300, bbox_inches="tight")
-                plt.close()
- 
+            graph = csr_graph.grid(height, width)
+            save_graph(graph, f"grids/grid_{height}.txt")
+
+            # networkx view only for plotting
+            G = graph.to_networkx()
+
+            # grid-based layout
+            pos = {}
+            for i in range(height):
+                for j in range(width):
+                    node = i * width + j
+                    pos[node] = (j, -i)  # x=j, y=i; negative y to flip vertically
+
+            # Plot
+            plt.figure(figsize=(8, height / 10))  # adjustable scale
+            nx.draw(
+                G,
+                pos,
+                node_size=20,
+                width=0.5,
+                with_labels=False
+            )
+
+            plt.savefig(f"pngs/grid_network_level_{height}.png", dpi=300, bbox_inches="tight")
+            plt.close()
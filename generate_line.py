@@ -1,6 +1,8 @@
 import networkx as nx
 import matplotlib.pyplot as plt
 import os
+import csr_graph
+from graph_store import save_graph
 
 def build_graph_and_save(output_folder="lines_2", plot_folder="pngs"):
     # Create folders
@@ -9,7 +11,7 @@ def build_graph_and_save(output_folder="lines_2", plot_folder="pngs"):
     os.makedirs(plot_folder, exist_ok=True)
 
     # Step 1: line graph of 1000 nodes
-    G = nx.path_graph(1000)
+    n = 1000
 
     # Step 2: center points
     left = 499
@@ -29,19 +31,17 @@ def build_graph_and_save(output_folder="lines_2", plot_folder="pngs"):
     step = 0
     while left >= 0 and right <= 999:
 
-        # Add cross-edge
-        G.add_edge(left, right)
+        # Path plus cross-edges up to (left, right)
+        graph = csr_graph.line(n, step)
 
         # Save edge list
         filename = os.path.join(output_folder, f"line_{step}.txt")
-        with open(filename, "w") as f:
-            for u, v in G.edges():
-                f.write(f"{u} {v}\n")
+        save_graph(graph, filename)
 
         # Plot every 10 iterations
         if step % 10 == 0:
             plt.figure(figsize=(14, 4))
-            nx.draw(G, pos, node_size=10, width=0.5, with_labels=False)
+            nx.draw(graph.to_networkx(), pos, node_size=10, width=0.5, with_labels=False)
             plot_name = os.path.join(plot_folder, f"iteration_{step}.png")
             plt.savefig(plot_name, dpi=200, bbox_inches="tight")
             plt.close()
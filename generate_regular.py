@@ -1,7 +1,9 @@
 import networkx as nx
+from csr_graph import CSRGraph
+from graph_store import save_graph
 if __name__ == "__main__":
     n = 1000
     for d in range (101, 1000): 
         for i in range(0,1):
             G = nx.random_regular_graph(d, n)
-            nx.write_edgelist(G, f"regular_graphs/d{d}_{i}.txt", data=False)
\ No newline at end of file
+            save_graph(CSRGraph.from_networkx(G), f"regular_graphs/d{d}_{i}.txt")
\ No newline at end of file
@@ -1,6 +1,9 @@
 import networkx as nx
 import random
 import matplotlib.pyplot as plt
+import csr_graph
+from graph_store import save_graph
+from connectivity import bisect_connectivity
 
 def save_edge_list_txt(G, filename):
     with open(filename, "w") as f:
@@ -40,22 +43,24 @@ def generate_bottleneck_graphs(generations):
         print(f"\n=== Generation {gen} ===")
         cluster2_nodes = [i+500 for i in cluster2.nodes()]
 
-        U = nx.disjoint_union(cluster1, cluster2)
+        edges1 = list(cluster1.edges())
+        edges2 = list(cluster2.edges())
 
-        for i in range (0,500):
-            U.add_edge(i, i+500)
-            conn = nx.algebraic_connectivity(U, method="lanczos", normalized=True)
-            if (conn < 0.006 and conn >=0.005): 
-                break
+        # fewest bridges (i, i+500) bringing the connectivity into [0.005, 0.006)
+        n_bridges, conn = bisect_connectivity(
+            lambda k: csr_graph.bottleneck(edges1, edges2, 500, k), 500, 0.005, 0.006
+        )
+        graph = csr_graph.bottleneck(edges1, edges2, 500, n_bridges)
 
-        avg_degree = sum(dict(U.degree()).values()) / U.number_of_nodes()
-        conn = nx.algebraic_connectivity(U, method="lanczos", normalized=True)
+        avg_degree = graph.degrees().mean()
 
+        print("Bridges:", n_bridges)
         print("Average degree:", avg_degree)
         print("Connectivity", conn)
         # Step 3 — save graph
         filename = f"bottlenecks_regular/bottleneck_{gen}.txt"
-        save_edge_list_txt(U, filename)
+        save_graph(graph, filename)
+        U = graph.to_networkx()
         plot_graph_png(U, [cluster1,cluster2_nodes], f"pngs_regular/bottleneck_{gen}.png")
         
 if __name__ == "__main__":
@@ -1,6 +1,8 @@
 import networkx as nx
 import matplotlib.pyplot as plt
 import numpy as np
+import csr_graph
+from graph_store import save_graph
 
 def generate_network_grid(height, width):
     edge_dict = {}
@@ -64,16 +66,12 @@ if __name__ == "__main__":
     width = 201
 
     for level in range(1, 9):
-        edge_list = generate_tree(level, height, width)
+        graph = csr_graph.tree(level, height, width)
+        save_graph(graph, f"trees/tree_{level}.txt")
 
-        with open(f"trees/tree_{level}.txt", "w") as f:
-            for n1, n2 in edge_list:
-                f.write(f"{n1} {n2}\n")
-
-        G = nx.Graph()
+        # networkx view only for plotting
+        G = graph.to_networkx()
         total_nodes = height * width
-        G.add_nodes_from(range(total_nodes))
-        G.add_edges_from(edge_list)
         pos = {i: (i % width, -i // width) for i in range(total_nodes)}
 
         plt.figure(figsize=(10, 6))
@@ -1,8 +1,17 @@
 import pandas as pd
 from pathlib import Path
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import networkx as nx
 import numpy as np
 from scipy.optimize import fsolve
+from tqdm import tqdm
+from checkpoint import truncate_partial_line
+from graph_store import current_store, family_files, iter_family, load_graph
+from connectivity import algebraic_connectivity
+from degree_correlation import amplification_and_acceleration as estimate_amp_acc
+from fixation_results import RESULTS_DIR, amp_acc_table
 
 def overwrite_amp(
     csv_file="params.csv",
@@ -48,17 +57,14 @@ def overwrite_amp(
 def add_graph_type_to_csv(
     graph_type: str,
     graphs_root="graphs",
-    output_file="params.csv"
+    output_file="params.csv",
+    store_root="graph_store"
 ):
     """
     Adds a new graph type to params.csv without recomputing existing graphs.
     """
-    graph_dir = Path(graphs_root) / graph_type
     output_file = Path(output_file)
 
-    if not graph_dir.exists():
-        raise FileNotFoundError(f"Graph directory not found: {graph_dir}")
-
     # Load existing CSV if it exists
     if output_file.exists():
         df = pd.read_csv(output_file)
@@ -71,15 +77,11 @@ def add_graph_type_to_csv(
 
     new_rows = []
 
-    for path in graph_dir.iterdir():
-        name = path.stem
-
+    for name, graph in iter_family(graph_type, graphs_root, store_root):
         if (graph_type, name) in existing:
             continue  # already in CSV
 
-        G = nx.read_edgelist(path, nodetype=int)
-
-        degrees = [d for _, d in G.degree()]
+        degrees = graph.degrees()
         amp_file = Path("amplification") / graph_type / f"{name}.txt"
         acc_file = Path("acceleration") / graph_type / f"{name}.txt"
 
@@ -96,9 +98,9 @@ def add_graph_type_to_csv(
             "degree_var": np.var(degrees),
             "amp": amp,
             "acc": float(acc),
-            "connectivity": nx.algebraic_connectivity(G, method="lanczos", normalized=True),
-            "transitivity": nx.transitivity(G), 
-            "degree_assortativity": nx.degree_assortativity_coefficient(G)
+            "connectivity": algebraic_connectivity(graph),
+            "transitivity": graph.transitivity(),
+            "degree_assortativity": graph.degree_assortativity()
         })
 
     if not new_rows:
@@ -113,42 +115,244 @@ def add_graph_type_to_csv(
 
 def add_degree_assortativity(
     csv_file="params.csv",
-    graphs_root="graphs"
+    graphs_root="graphs",
+    store_root="graph_store"
 ):
     """
     Adds NetworkX degree_assortativity_coefficient to an existing params.csv.
     Assumes params.csv has columns: graph_type, graph_name
     """
-    csv_file = Path(csv_file)
-    df = pd.read_csv(csv_file)
+    graph_types = pd.read_csv(csv_file, usecols=["graph_type"])["graph_type"].unique()
+    return update_metrics(
+        graph_types,
+        ["degree_assortativity"],
+        csv_file=csv_file,
+        graphs_root=graphs_root,
+        store_root=store_root,
+        add_graphs=False
+    )
 
-    # Create column if it doesn't exist
-    if "degree_assortativity" not in df.columns:
-        df["degree_assortativity"] = np.nan
 
-    for idx, row in df.iterrows():
-        graph_type = row["graph_type"]
-        graph_name = row["graph_name"]
+# column in params.csv -> function of a CSRGraph
+METRICS = {
+    "degree_mean": lambda graph: np.mean(graph.degrees()),
+    "degree_var": lambda graph: np.var(graph.degrees()),
+    "connectivity": algebraic_connectivity,
+    "transitivity": lambda graph: graph.transitivity(),
+    "degree_assortativity": lambda graph: graph.degree_assortativity(),
+}
 
-        graph_path = Path(graphs_root) / graph_type / f"{graph_name}.txt"
+# degree-class estimates that fill the amp/acc columns only when asked for by
+# name, since by default those hold the values measured in simulations: the
+# position of each in the (amp, acc) pair estimate_amp_acc returns, which is
+# computed once per graph for both
+ESTIMATES = {"amp": 0, "acc": 1}
 
-        if not graph_path.exists():
-            print(f"Missing graph file: {graph_path}")
-            continue
 
-        try:
-            G = nx.read_edgelist(graph_path, nodetype=int)
+def family_hashes(graph_type, graphs_root="graphs", store_root="graph_store"):
+    """
+    {graph_name: content hash} for a family without parsing any graph: the
+    sha1 of the CSR arrays for a binary store that matches the text files
+    (graph_store.current_store), of the file bytes otherwise.
+    """
+    store = current_store(graph_type, graphs_root, store_root)
+    hashes = {}
+    if store is not None:
+        for name in store.names():
+            graph = store.get(name)
+            digest = hashlib.sha1(np.ascontiguousarray(graph.indptr))
+            digest.update(np.ascontiguousarray(graph.indices))
+            hashes[name] = digest.hexdigest()
+        return hashes
 
-            assort = nx.degree_assortativity_coefficient(G)
+    graph_dir = Path(graphs_root) / graph_type
+    if not graph_dir.exists():
+        raise FileNotFoundError(f"Graph directory not found: {graph_dir}")
+    for path in family_files(graph_dir):
+        hashes[path.stem] = hashlib.sha1(path.read_bytes()).hexdigest()
+    return hashes
+
+
+def load_metric_cache(cache_file):
+    """
+    {graph hash: {metric: value}} from the JSON lines written by
+    update_metrics; a metric that failed on a graph is cached as None.
+    """
+    cache = {}
+    cache_file = Path(cache_file)
+    if not cache_file.exists():
+        return cache
+    with open(cache_file, "r") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                # half-written last line from an interrupted run
+                continue
+            cache.setdefault(row["hash"], {}).update(row["metrics"])
+    return cache
 
-            df.at[idx, "degree_assortativity"] = assort
 
+def _compute_metrics(graph_type, name, metrics, graphs_root, store_root):
+    # {metric: value}, None for the metrics that failed, and their errors
+    graph = load_graph(graph_type, name, graphs_root, store_root)
+    values, errors = {}, {}
+    estimates = None
+    for metric in metrics:
+        try:
+            if metric in ESTIMATES:
+                if estimates is None:
+                    estimates = estimate_amp_acc(graph)
+                values[metric] = float(estimates[ESTIMATES[metric]])
+            else:
+                values[metric] = float(METRICS[metric](graph))
         except Exception as e:
-            print(f"Failed on {graph_type}/{graph_name}: {e}")
+            print(f"Failed {metric} on {graph_type}/{name}: {e}")
+            values[metric] = None
+            errors[metric] = f"{type(e).__name__}: {e}"
+    return values, errors
+
+
+def update_metrics(
+    graph_types,
+    metrics=None,
+    csv_file="params.csv",
+    graphs_root="graphs",
+    store_root="graph_store",
+    cache_file="metric_cache.jsonl",
+    add_graphs=True,
+    max_workers=None,
+    retry_failed=False
+):
+    """
+    Fill the metric columns of csv_file for every graph of graph_types.
+
+    Results are cached by graph content hash in cache_file, so only the
+    (graph, metric) pairs never computed for that exact graph are run; those
+    are spread over a process pool, one job per graph, and appended to the
+    cache as they finish. Failures are cached too and left empty in the
+    table, so they are not rerun on every call unless retry_failed is set.
+    params.csv is read and written once, at the end. With add_graphs=False
+    only graphs already in csv_file are updated.
+    """
+    metrics = list(METRICS) if metrics is None else list(metrics)
+    unknown = [m for m in metrics if m not in METRICS and m not in ESTIMATES]
+    if unknown:
+        raise ValueError(f"Unknown metrics {unknown}, expected some of {list(METRICS) + list(ESTIMATES)}")
 
+    csv_file = Path(csv_file)
+    df = pd.read_csv(csv_file) if csv_file.exists() else pd.DataFrame(columns=["graph_type", "graph_name"])
+    df = df.set_index(["graph_type", "graph_name"])
+    df = df[~df.index.duplicated(keep="last")]
+
+    hashes = {}
+    for graph_type in graph_types:
+        try:
+            family = family_hashes(graph_type, graphs_root, store_root)
+        except FileNotFoundError as e:
+            print(e)
+            continue
+        for name, digest in family.items():
+            if add_graphs or (graph_type, name) in df.index:
+                hashes[(graph_type, name)] = digest
+
+    cache = load_metric_cache(cache_file)
+    todo = {}
+    for key, digest in hashes.items():
+        cached = cache.get(digest, {})
+        missing = [m for m in metrics if m not in cached or (retry_failed and cached[m] is None)]
+        # identical graphs under different names are computed once
+        if missing and digest not in todo:
+            todo[digest] = (key, missing)
+    print(f"{len(hashes)} graphs, computing {sum(len(m) for _, m in todo.values())} missing metric values")
+
+    if todo:
+        # rows appended below must not be glued onto a half-written last line
+        truncate_partial_line(cache_file)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool, open(cache_file, "a") as out:
+            futures = {
+                pool.submit(_compute_metrics, graph_type, name, missing, graphs_root, store_root): digest
+                for digest, ((graph_type, name), missing) in todo.items()
+            }
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                digest = futures[future]
+                values, errors = future.result()
+                cache.setdefault(digest, {}).update(values)
+                row = {"hash": digest, "metrics": values}
+                if errors:
+                    row["errors"] = errors
+                out.write(json.dumps(row) + "\n")
+                out.flush()
+
+    new = pd.DataFrame.from_dict(
+        {key: {m: cache.get(digest, {}).get(m) for m in metrics} for key, digest in hashes.items()},
+        orient="index"
+    ).astype(float)
+    if new.empty:
+        print("No graphs to update")
+        return df.reset_index()
+    new.index = pd.MultiIndex.from_tuples(new.index, names=["graph_type", "graph_name"])
+
+    df = df.reindex(df.index.append(new.index.difference(df.index)))
+    for metric in metrics:
+        df.loc[new.index, metric] = new[metric]
+    df = df.reset_index()
     df.to_csv(csv_file, index=False)
-    print(f"Updated {csv_file} with degree_assortativity_coefficient")
+    print(f"Updated {metrics} for {len(new)} graphs in {csv_file}")
+    return df
+
+
+def add_estimated_amp_acc(
+    graph_types,
+    csv_file="params.csv",
+    graphs_root="graphs",
+    store_root="graph_store",
+    max_workers=None
+):
+    """
+    Write the degree-correlation estimates of amp and acc
+    (degree_correlation.amplification_and_acceleration) for every graph of
+    graph_types into csv_file, replacing the amp/acc columns for those rows.
+    """
+    return update_metrics(
+        graph_types,
+        list(ESTIMATES),
+        csv_file=csv_file,
+        graphs_root=graphs_root,
+        store_root=store_root,
+        max_workers=max_workers
+    )
 
+
+def update_amp_acc(
+    graph_types=None,
+    s=0.001,
+    csv_file="params.csv",
+    results_dir=RESULTS_DIR
+):
+    """
+    Set the amp/acc columns of csv_file, and amp_low/amp_high (the 95%
+    interval of amp), from the fixation result table (fixation_results) for
+    simulations at selection s, replacing the per-graph
+    amplification/acceleration text files read by overwrite_amp. Graphs
+    without results keep their values.
+    """
+    where = {"s": s}
+    if graph_types is not None:
+        where["graph_type"] = list(graph_types)
+    new = amp_acc_table(results_dir, **where).drop(columns="s")
+    new = new.set_index(["graph_type", "graph_name"])
+
+    csv_file = Path(csv_file)
+    df = pd.read_csv(csv_file).set_index(["graph_type", "graph_name"])
+    matched = new.index.intersection(df.index)
+    for column in ("amp", "amp_low", "amp_high", "acc"):
+        values = new.loc[matched, column]
+        keep = values.notna()
+        df.loc[values.index[keep], column] = values[keep]
+    df = df.reset_index()
+    df.to_csv(csv_file, index=False)
+    print(f"Updated amp/acc for {len(matched)} graphs in {csv_file}")
     return df
 
 
@@ -165,23 +369,19 @@ def amplification_and_acceleration(amp_file: Path, acc_file: Path):
         print(f"Missing file: {e.filename}")
         return amp, acc
     
-def generate_add(base_dirs, output_file="cons.csv"):
+def generate_add(base_dirs, output_file="cons.csv", store_root="graph_store"):
     all_results = []
 
     for base_dir in base_dirs:
         print(base_dir)
         base_dir = Path(base_dir)
+        typee = base_dir.name
 
-        for path in base_dir.iterdir():
-            name = path.stem
-            G = nx.read_edgelist(path, nodetype=int)
-
-            degrees = [deg for _, deg in G.degree()]
+        for name, graph in iter_family(typee, base_dir.parent, store_root):
+            degrees = graph.degrees()
             degree_variance = np.var(degrees)
             degree_mean = np.mean(degrees)
 
-            typee = base_dir.name
-
             amp_file = Path("amplification") / typee / f"{name}.txt"
             acc_file = Path("acceleration") / typee / f"{name}.txt"
 
@@ -191,8 +391,8 @@ def generate_add(base_dirs, output_file="cons.csv"):
                 continue
 
             amp, acc = result
-            conn = nx.algebraic_connectivity(G, method="lanczos", normalized=True)
-            trans = nx.transitivity(G)
+            conn = algebraic_connectivity(graph)
+            trans = graph.transitivity()
 
             all_results.append({
                 "graph_type": typee,
@@ -224,21 +424,19 @@ def generate_add(base_dirs, output_file="cons.csv"):
     print(f"Saved {len(new_df)} new rows. Total rows now: {len(df)}")
     return df
 
-def generate(base_dirs, output_file="cons.csv"):
+def generate(base_dirs, output_file="cons.csv", store_root="graph_store"):
     all_results = []
 
     for base_dir in base_dirs:
         print(base_dir)
         base_dir = Path(base_dir)
-        for path in base_dir.iterdir():
-            #name =  path.stem
-            _,_,name = str(path).rsplit("/", 2)
-            G = nx.read_edgelist(path, nodetype=int)
-            degrees = [deg for _, deg in G.degree()]
+        typee =  base_dir.name
+        for stem, graph in iter_family(typee, base_dir.parent, store_root):
+            # names in this table keep the file extension
+            name = f"{stem}.txt"
+            degrees = graph.degrees()
             degree_variance = np.var(degrees)
             degree_mean = np.mean(degrees)
-            
-            typee =  base_dir.name
 
             """
             amp_file = Path("amplification") / typee / f"{name}.txt"
@@ -251,9 +449,9 @@ def generate(base_dirs, output_file="cons.csv"):
             amp, acc = result
             """
             amp, acc = 0,0
-            conn = nx.algebraic_connectivity(G, method="lanczos", normalized=True)
-            trans = nx.transitivity(G)
-            ass = nx.degree_assortativity_coefficient(G)
+            conn = algebraic_connectivity(graph)
+            trans = graph.transitivity()
+            ass = graph.degree_assortativity()
 
             all_results.append({  
                     "graph_type":  typee,               
@@ -283,7 +481,8 @@ for graph in ["bottlenecks_2", "bottlenecks_4", "bottlenecks_regular", "fingers"
 #df = generate(dirs, output_file="assortative.csv")
 #df = generate_add(dirr, output_file="params.csv" )
 #add_graph_type_to_csv("PA_assortative")
-df = add_degree_assortativity()
+if __name__ == "__main__":
+    df = add_degree_assortativity()
 """
 overwrite_amp_for_pa_assortative(
     csv_file="params.csv",
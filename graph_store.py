@@ -0,0 +1,310 @@
+import atexit
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from csr_graph import CSRGraph, read_edge_list
+
+
+class GraphStore(object):
+    """
+    Binary store for one graph family (e.g. graph_store/grids), replacing a
+    directory of text edge lists.
+
+    The CSR arrays of every graph are appended to two raw files, indptr.bin
+    (int64, each graph's own indptr starting at 0) and indices.bin (int32),
+    or the versioned names compact() gives them, and index.json names the
+    two files and maps graph names to their slices, together with the size
+    and mtime of the text file each graph was stored from, so a reader can
+    tell whether the store still matches graphs/. Loading a graph is a pair
+    of memory-mapped slices, so nothing is parsed or copied until the arrays
+    are used.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._index_file = self.path / "index.json"
+        # name -> [indptr offset, number of nodes, indices offset, number of
+        # entries, source size, source mtime_ns]
+        self.index = {}
+        self._indptr_end = self._indices_end = 0
+        self._arrays = ["indptr.bin", "indices.bin"]
+        if self._index_file.exists():
+            with open(self._index_file, "r") as f:
+                index = json.load(f)
+            if "graphs" in index:
+                self.index = index["graphs"]
+                self._indptr_end = index["indptr_end"]
+                self._indices_end = index["indices_end"]
+                self._arrays = index.get("arrays", self._arrays)
+            else:
+                # the first format: only the slices, and the file ends lie
+                # behind the last slice
+                self.index = {name: entry[:4] + [None, None] for name, entry in index.items()}
+                self._indptr_end = max((e[0] + e[1] + 1 for e in self.index.values()), default=0)
+                self._indices_end = max((e[2] + e[3] for e in self.index.values()), default=0)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def names(self):
+        return list(self.index)
+
+    def _live(self):
+        return sum(n + 1 for _, n, _, _, _, _ in self.index.values()), sum(e[3] for e in self.index.values())
+
+    def write_index(self):
+        """
+        Write index.json, first compacting the arrays when replaced graphs
+        take up more room than the stored ones.
+        """
+        live_indptr, live_indices = self._live()
+        if self._indptr_end > 2 * live_indptr or self._indices_end > 2 * live_indices:
+            self.compact()
+            return
+        self._write_index_file()
+
+    def _write_index_file(self):
+        tmp = self._index_file.with_name("index.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({
+                "graphs": self.index, "indptr_end": self._indptr_end, "indices_end": self._indices_end,
+                "arrays": self._arrays,
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._index_file)
+
+    def compact(self):
+        """
+        Rewrite the arrays with only the stored graphs, dropping replaced
+        ones. The new arrays go to files of a new version that only the new
+        index names, so until index.json is replaced the old index and
+        arrays are untouched, and the replace itself switches both at once.
+        """
+        graphs = [(name, self.get(name), self.index[name][4:]) for name in self.index]
+        indptr = np.concatenate([np.asarray(g.indptr, dtype="<i8") for _, g, _ in graphs] or [np.empty(0, "<i8")])
+        indices = np.concatenate([np.asarray(g.indices, dtype="<i4") for _, g, _ in graphs] or [np.empty(0, "<i4")])
+        index, indptr_end, indices_end = {}, 0, 0
+        for name, graph, source in graphs:
+            index[name] = [indptr_end, graph.n, indices_end, len(graph.indices)] + source
+            indptr_end += graph.n + 1
+            indices_end += len(graph.indices)
+        version = 1 + max((int(f.name.split(".")[1]) for f in self.path.glob("indptr.*.bin")), default=0)
+        arrays = [f"indptr.{version}.bin", f"indices.{version}.bin"]
+        for filename, values in zip(arrays, (indptr, indices)):
+            with open(self.path / filename, "wb") as f:
+                values.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+        self.index, self._indptr_end, self._indices_end = index, indptr_end, indices_end
+        self._arrays = arrays
+        self._write_index_file()
+        # the old arrays, and any left by a compaction that crashed before
+        # its index write
+        for file in [*self.path.glob("indptr*.bin"), *self.path.glob("indices*.bin")]:
+            if file.name not in arrays:
+                file.unlink()
+
+    def _append(self, filename, values, end):
+        file = self.path / filename
+        with open(file, "r+b" if file.exists() else "wb") as f:
+            # drop anything written after the last index update (a crash mid-add)
+            f.truncate(end * values.itemsize)
+            f.seek(0, os.SEEK_END)
+            values.tofile(f)
+
+    def add(self, name, graph, source=None, write_index=True):
+        """
+        Append graph under name, replacing any graph stored under it; the
+        space of replaced graphs is reclaimed by write_index() once it
+        outgrows the stored ones. source is the text file the graph was
+        saved to, whose size and mtime are recorded for is_current(). Bulk
+        writers can pass write_index=False and call write_index() once at
+        the end.
+        """
+        indptr = np.asarray(graph.indptr, dtype="<i8")
+        indices = np.asarray(graph.indices, dtype="<i4")
+        self._append(self._arrays[0], indptr, self._indptr_end)
+        self._append(self._arrays[1], indices, self._indices_end)
+        stat = Path(source).stat() if source is not None else None
+        self.index[name] = [
+            self._indptr_end, len(indptr) - 1, self._indices_end, len(indices),
+            stat.st_size if stat else None, stat.st_mtime_ns if stat else None
+        ]
+        self._indptr_end += len(indptr)
+        self._indices_end += len(indices)
+        # arrays first, then the index, so a crash never leaves a dangling entry
+        if write_index:
+            self.write_index()
+
+    def is_current(self, name, path):
+        """Whether name is stored from the text file path as it is now."""
+        if name not in self.index:
+            return False
+        size, mtime = self.index[name][4:]
+        try:
+            stat = Path(path).stat()
+        except OSError:
+            return False
+        return size == stat.st_size and mtime == stat.st_mtime_ns
+
+    def matches(self, graph_dir):
+        """
+        Whether the store holds exactly the graphs of graph_dir/*.txt, each
+        stored from the file as it is now. Only the files are stat-ed.
+        """
+        paths = family_files(graph_dir)
+        return len(paths) == len(self.index) and all(self.is_current(p.stem, p) for p in paths)
+
+    def _memmap(self, filename, dtype, end):
+        if end == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.path / filename, dtype=dtype, mode="r", shape=(end,))
+
+    def get(self, name):
+        """CSRGraph whose indptr/indices are read-only memmap views."""
+        indptr_offset, n, indices_offset, nnz = self.index[name][:4]
+        indptr = self._memmap(self._arrays[0], "<i8", self._indptr_end)
+        indices = self._memmap(self._arrays[1], "<i4", self._indices_end)
+        return CSRGraph(
+            indptr[indptr_offset:indptr_offset + n + 1],
+            indices[indices_offset:indices_offset + nnz]
+        )
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def items(self):
+        for name in self.index:
+            yield name, self.get(name)
+
+
+def family_files(graph_dir):
+    """The text edge lists of a family directory, sorted."""
+    return sorted(Path(graph_dir).glob("*.txt"))
+
+
+# stores opened by save_graph, whose index writes are batched
+_open_stores = {}
+INDEX_EVERY = 256
+
+
+def save_graph(graph, filename, store_root="graph_store"):
+    """
+    Write graph as a text edge list to filename (still read by the C++
+    simulators) and add it to the store of its family, the name of the
+    directory filename is in, under the file's stem, replacing an older
+    graph of that name.
+
+    The store stays open and its index is written every INDEX_EVERY graphs
+    and when the interpreter exits (or on flush_stores()); graphs added
+    after the last index write are simply not in the store after a crash,
+    and readers then fall back to the text files.
+    """
+    filename = Path(filename)
+    graph.save_edge_list(filename)
+    store_dir = Path(store_root) / filename.parent.name
+    key = str(store_dir.resolve())
+    if key not in _open_stores:
+        _open_stores[key] = [GraphStore(store_dir), 0]
+    entry = _open_stores[key]
+    entry[0].add(filename.stem, graph, source=filename, write_index=False)
+    entry[1] += 1
+    if entry[1] % INDEX_EVERY == 0:
+        entry[0].write_index()
+
+
+def flush_stores():
+    """Write the index of every store save_graph has added to."""
+    for store, _ in _open_stores.values():
+        store.write_index()
+    _open_stores.clear()
+
+
+atexit.register(flush_stores)
+
+
+def current_store(graph_type, graphs_root="graphs", store_root="graph_store"):
+    """
+    The GraphStore of a family if it matches graphs_root/graph_type, or if
+    that directory is gone and the store is all there is; None otherwise.
+    """
+    store_dir = Path(store_root) / graph_type
+    if not (store_dir / "index.json").exists():
+        return None
+    store = GraphStore(store_dir)
+    graph_dir = Path(graphs_root) / graph_type
+    if not graph_dir.exists() or store.matches(graph_dir):
+        return store
+    return None
+
+
+def iter_family(graph_type, graphs_root="graphs", store_root="graph_store"):
+    """
+    (name, CSRGraph) for every graph of a family, from the binary store if
+    it matches graphs_root/graph_type (GraphStore.matches) and from
+    graphs_root/graph_type/*.txt otherwise.
+    """
+    store = current_store(graph_type, graphs_root, store_root)
+    if store is not None:
+        yield from store.items()
+        return
+    graph_dir = Path(graphs_root) / graph_type
+    if not graph_dir.exists():
+        raise FileNotFoundError(f"Graph directory not found: {graph_dir}")
+    for path in family_files(graph_dir):
+        yield path.stem, read_edge_list(path)
+
+
+def load_graph(graph_type, name, graphs_root="graphs", store_root="graph_store"):
+    """One graph by family and name, from the binary store if it is current."""
+    path = Path(graphs_root) / graph_type / f"{name}.txt"
+    store_dir = Path(store_root) / graph_type
+    if (store_dir / "index.json").exists():
+        store = GraphStore(store_dir)
+        if store.is_current(name, path) or (name in store and not path.exists()):
+            return store.get(name)
+    return read_edge_list(path)
+
+
+def convert(graphs_root="graphs", store_root="graph_store", graph_types=None):
+    """
+    Build graph_store/<type> from every graphs/<type>/*.txt directory. Each
+    family is written to a fresh directory and swapped in at the end, so the
+    result is compact and an interrupted conversion leaves the old store.
+    """
+    graphs_root = Path(graphs_root)
+    store_root = Path(store_root)
+    if graph_types is None:
+        graph_types = sorted(p.name for p in graphs_root.iterdir() if p.is_dir())
+
+    for graph_type in graph_types:
+        paths = family_files(graphs_root / graph_type)
+        tmp_dir = store_root / f"{graph_type}.tmp"
+        if tmp_dir.exists():
+            for file in tmp_dir.iterdir():
+                file.unlink()
+        store = GraphStore(tmp_dir)
+        for path in paths:
+            store.add(path.stem, read_edge_list(path), source=path, write_index=False)
+        store.write_index()
+
+        final_dir = store_root / graph_type
+        if final_dir.exists():
+            for file in final_dir.iterdir():
+                file.unlink()
+            final_dir.rmdir()
+        os.replace(tmp_dir, final_dir)
+        print(f"{graph_type}: {len(paths)} graphs -> {final_dir}")
+
+
+if __name__ == "__main__":
+    convert(*sys.argv[1:3])
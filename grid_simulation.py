@@ -1,14 +1,19 @@
 import numpy as np 
-import random
 import tqdm
 import math
+import time
+from checkpoint import save_checkpoint, load_checkpoint
+from observables import consume, lattice_observables
+from variants import VariantTable
 
 
 
-def grid_simulation(grid, new_idx, num_generation, dim, deme_pop, s, r, migration_prob, mutant_prob): 
-    rng = np.random.default_rng()
+def grid_simulation(grid, new_idx, num_generation, dim, deme_pop, s, r, migration_prob, mutant_prob, prune_every=10, rng=None): 
+    rng = np.random.default_rng(rng)
+    reclaimed = 0
 
-    for gen in tqdm.tqdm(range(num_generation)):
+    progress = tqdm.tqdm(range(num_generation))
+    for gen in progress:
 
         #reproducing and mutating 
         j=0
@@ -59,8 +64,9 @@ def grid_simulation(grid, new_idx, num_generation, dim, deme_pop, s, r, migratio
                     #print("pop" + str(pop))
 
                     for m in range(migrate): 
-                        locations = [(i-1, j-1),(i-1, j), (i-1, j+1), (i, j+1), (i+1, j+1), (i+1, j), (i+1, j-1), (i, j-1)]
-                        loc_idx = random.randint(0, 7)
+                        #(row, col) of the 8 neighbours of grid[j][i], in NEIGHBOURS order
+                        locations = [(j-1, i-1), (j-1, i), (j-1, i+1), (j, i+1), (j+1, i+1), (j+1, i), (j+1, i-1), (j, i-1)]
+                        loc_idx = rng.integers(0, 8)
                         """
                         -------
                         |0|1|2|
@@ -91,5 +97,229 @@ def grid_simulation(grid, new_idx, num_generation, dim, deme_pop, s, r, migratio
                     #print("pop" + str(pop))
                     #print("variant" + str(variant))
                     #print("pop" + str(deme[variant]))
-      
-    return grid, new_idx
\ No newline at end of file
+
+        #prune extinct variants so later generations do not iterate over them
+        if prune_every and (gen + 1) % prune_every == 0:
+            before = {variant for row in grid for deme in row for variant in deme}
+            for row in grid:
+                for deme in row:
+                    for variant in [v for v, pop in deme.items() if pop == 0]:
+                        del deme[variant]
+            after = {variant for row in grid for deme in row for variant in deme}
+            reclaimed += len(before - after)
+            progress.set_postfix(live=len(after), reclaimed=reclaimed)
+
+    return grid, new_idx
+
+# neighbour offsets (row, col), in the order used by grid_simulation:
+# -------
+# |0|1|2|
+# |7|x|3|
+# |6|5|4|
+# -------
+NEIGHBOURS = [(-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
+
+
+def grid_to_array(grid, dim):
+    """
+    Convert a dim x dim grid of {variant: pop} dicts into a dense
+    (dim, dim, n_variants) count array and the variant id of every column.
+    """
+    ids = sorted({variant for row in grid for deme in row for variant in deme})
+    column = {variant: c for c, variant in enumerate(ids)}
+    pop = np.zeros((dim, dim, max(len(ids), 1)), dtype=np.int64)
+    for j, row in enumerate(grid):
+        for i, deme in enumerate(row):
+            for variant, count in deme.items():
+                pop[j, i, column[variant]] = count
+    return pop, np.array(ids, dtype=np.int64)
+
+
+def array_to_grid(pop, ids, grid):
+    """
+    Write a dense count array back into the {variant: pop} dicts of grid.
+    Variants with a count of 0 are left out.
+    """
+    for j, row in enumerate(pop):
+        for i, deme in enumerate(row):
+            nonzero = np.flatnonzero(deme)
+            grid[j][i] = dict(zip(ids[nonzero].tolist(), deme[nonzero].tolist()))
+    return grid
+
+
+def _grow(pop, needed):
+    # double the variant axis so appending mutants is amortised O(1)
+    capacity = max(2 * pop.shape[2], needed)
+    grown = np.zeros(pop.shape[:2] + (capacity,), dtype=pop.dtype)
+    grown[:, :, :pop.shape[2]] = pop
+    return grown
+
+
+def _compact(pop, table):
+    # move the surviving columns to the front and clear the freed tail
+    n = len(table)
+    alive = table.compact(pop[:, :, :n])
+    live = len(table)
+    if live < n:
+        pop[:, :, :live] = pop[:, :, :n][:, :, alive]
+        pop[:, :, live:n] = 0
+    return live
+
+
+def _shifted(dr, dc, dim):
+    # (destination, source) slices for moving every deme by (dr, dc)
+    dst = (slice(max(dr, 0), dim + min(dr, 0)), slice(max(dc, 0), dim + min(dc, 0)))
+    src = (slice(max(-dr, 0), dim + min(-dr, 0)), slice(max(-dc, 0), dim + min(-dc, 0)))
+    return dst, src
+
+
+def grid_simulation_vectorized(grid, new_idx, num_generation, dim, deme_pop, s, r, migration_prob, mutant_prob, gc_every=1, rng=None, checkpoint_file=None, checkpoint_every=300, observe=None, observe_every=1):
+    """
+    Array-backed version of grid_simulation with the same arguments and
+    return value. Populations live in a dense (dim, dim, n_variants) array
+    and every step of a generation is one batched draw over the lattice.
+    Migrants go to the 8 neighbours of their deme, as in grid_simulation,
+    but all demes migrate at once; grid_simulation updates demes in place
+    row by row, so a migrant reaching a deme not yet visited can move again
+    in the same generation.
+    Extinct variants are dropped from the array every gc_every generations.
+
+    With checkpoint_file set, the full state is written there at most every
+    checkpoint_every seconds and after the last generation, with the number
+    of extinct variants reclaimed in its state; resume_grid_simulation
+    continues from it.
+
+    observe, if given, is called every observe_every generations with a dict
+    of observables (see observables.lattice_observables) together with the
+    number of variant columns held and of extinct variants reclaimed so
+    far, e.g.
+    observe=ColumnStore("trajectory").append to stream them to disk.
+    """
+    rng = np.random.default_rng(rng)
+
+    pop, ids = grid_to_array(grid, dim)
+    table = VariantTable(ids)
+    params = {
+        "num_generation": num_generation, "dim": dim, "deme_pop": deme_pop, "s": s, "r": r,
+        "migration_prob": migration_prob, "mutant_prob": mutant_prob, "gc_every": gc_every,
+    }
+    run = _run_grid(pop, table, new_idx, 0, params, rng, checkpoint_file, checkpoint_every,
+                    observe_every if observe is not None else 0)
+    pop, new_idx = consume(run, observe)
+
+    array_to_grid(pop, table.ids, grid)
+    return grid, new_idx
+
+
+def iter_grid_simulation(grid, new_idx, num_generation, dim, deme_pop, s, r, migration_prob, mutant_prob, every=1, gc_every=1, rng=None, checkpoint_file=None, checkpoint_every=300):
+    """
+    Generator form of grid_simulation_vectorized that yields the observables
+    every `every` generations while the run progresses, e.g. to follow the
+    clone count and mutant fraction over time in a single run. The final
+    state is written into grid once the generator is exhausted.
+    """
+    rng = np.random.default_rng(rng)
+
+    pop, ids = grid_to_array(grid, dim)
+    table = VariantTable(ids)
+    params = {
+        "num_generation": num_generation, "dim": dim, "deme_pop": deme_pop, "s": s, "r": r,
+        "migration_prob": migration_prob, "mutant_prob": mutant_prob, "gc_every": gc_every,
+    }
+    pop, new_idx = yield from _run_grid(pop, table, new_idx, 0, params, rng, checkpoint_file, checkpoint_every, every)
+    array_to_grid(pop, table.ids, grid)
+
+
+def resume_grid_simulation(checkpoint_file, num_generation=None, checkpoint_every=300, observe=None, observe_every=1):
+    """
+    Continue a grid_simulation_vectorized run from its checkpoint. The result
+    is identical to the uninterrupted run. num_generation can be raised to
+    extend a finished run. Returns a new grid and new_idx.
+    """
+    arrays, state, rng = load_checkpoint(checkpoint_file)
+    params = state["params"]
+    if num_generation is not None:
+        params["num_generation"] = num_generation
+
+    table = VariantTable(arrays["ids"])
+    table.reclaimed = state["reclaimed"]
+    run = _run_grid(arrays["pop"], table, state["new_idx"], state["gen"], params, rng,
+                    checkpoint_file, checkpoint_every, observe_every if observe is not None else 0)
+    pop, new_idx = consume(run, observe)
+
+    dim = params["dim"]
+    grid = np.empty((dim, dim), dtype=object)
+    array_to_grid(pop, table.ids, grid)
+    return grid, new_idx
+
+
+def _run_grid(pop, table, new_idx, start_gen, params, rng, checkpoint_file, checkpoint_every, observe_every):
+    # generator: yields observables every observe_every generations and
+    # returns the final (pop, new_idx)
+    dim, deme_pop, s, r = params["dim"], params["deme_pop"], params["s"], params["r"]
+    migration_prob, mutant_prob, gc_every = params["migration_prob"], params["mutant_prob"], params["gc_every"]
+    n = len(table)
+    last_checkpoint = time.monotonic()
+
+    progress = tqdm.tqdm(range(start_gen, params["num_generation"]), initial=start_gen, total=params["num_generation"])
+    for gen in progress:
+        live = pop[:, :, :n]
+
+        #reproducing and mutating
+        rates = np.where(table.ids == 0, r, r * (1 + s))
+        offspring = rng.binomial(live, rates)
+        new = rng.binomial(offspring, mutant_prob)
+        live += offspring - new
+
+        num_new = new.sum(axis=2)
+        total_new = int(num_new.sum())
+        if total_new:
+            if n + total_new > pop.shape[2]:
+                pop = _grow(pop, n + total_new)
+            #new ids are handed out row by row, as in grid_simulation
+            rows, cols = np.nonzero(num_new)
+            counts = num_new[rows, cols]
+            columns = np.arange(n, n + total_new)
+            pop[np.repeat(rows, counts), np.repeat(cols, counts), columns] = 1
+            new_idx = table.add(new_idx, total_new)
+            n += total_new
+            live = pop[:, :, :n]
+
+        #migration: split the migrants of every (deme, variant) over the 8
+        #neighbours with successive binomials, then add the shifted arrays.
+        #Migrants that leave the lattice are lost, as in grid_simulation.
+        remaining = rng.binomial(live, migration_prob)
+        live -= remaining
+        arrivals = np.zeros_like(live)
+        for k, (dr, dc) in enumerate(NEIGHBOURS):
+            moving = rng.binomial(remaining, 1 / (len(NEIGHBOURS) - k))
+            remaining -= moving
+            dst, src = _shifted(dr, dc, dim)
+            arrivals[dst] += moving[src]
+        live += arrivals
+
+        #sample down
+        total_pop = live.sum(axis=2, keepdims=True)
+        scaled = np.divide(live * deme_pop, total_pop, out=live.astype(float), where=total_pop != 0)
+        live[...] = np.ceil(scaled)
+
+        totals = None
+        if gc_every and (gen + 1) % gc_every == 0:
+            n = _compact(pop, table)
+            totals = table.totals
+            progress.set_postfix(live=n, reclaimed=table.reclaimed)
+
+        #checkpoint on the timer and after the last generation, so the final
+        #state, reclaimed count included, can be read back or extended
+        last_gen = gen + 1 == params["num_generation"]
+        if checkpoint_file and (last_gen or time.monotonic() - last_checkpoint >= checkpoint_every):
+            state = {"params": params, "gen": gen + 1, "new_idx": int(new_idx), "reclaimed": table.reclaimed}
+            save_checkpoint(checkpoint_file, {"pop": pop[:, :, :n], "ids": table.ids}, state, rng)
+            last_checkpoint = time.monotonic()
+
+        if observe_every and (gen + 1) % observe_every == 0:
+            stats = {"generation": gen + 1, "new_idx": int(new_idx), "variants": n, "reclaimed": table.reclaimed}
+            stats.update(lattice_observables(pop[:, :, :n], table.ids, totals))
+            yield stats
+
+    return pop[:, :, :n], new_idx
@@ -0,0 +1,153 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+def _last(names):
+    return names.str.rsplit("_", n=1).str[-1]
+
+
+def _middle(names):
+    # "rg_0.05_3" -> "0.05"
+    return names.str.rsplit("_", n=2).str[-2]
+
+
+def _frac(names):
+    return _last(names).str.replace("f", "", regex=False)
+
+
+# graph type -> (column, its value from the graph names) as reading.ipynb
+# writes them; types missing here get no extra column
+NAME_COLUMNS = {
+    "regular_graphs_4": ("frac_triangle", _frac),
+    "regular_graphs_10": ("frac_triangle", _frac),
+    "random_geometric_1": ("radius", _middle),
+    "random_geometric_2": ("jump_kernel", _middle),
+    "grids": ("height", _last),
+    "lines_2": ("connections", _last),
+    "fingers": ("connections", _last),
+    "bottlenecks_2": ("connections", _last),
+    "bottlenecks_4": ("connections", _last),
+    "PA": ("beta", _last),
+    "PA_assortative": ("beta", _last),
+}
+
+# graph types whose disconnected graphs and amplification above 500 are dropped
+FILTERED_TYPES = {"regular_graphs"}
+
+# params.csv column -> output column, in output order
+STATS_COLUMNS = {
+    "degree_mean": "degree",
+    "degree_var": "degree_variance",
+    "amp": "amplification",
+    "acc": "acc",
+    "connectivity": "connectivity",
+    "transitivity": "transitivity",
+}
+
+
+def _read_summary(path):
+    # the first two lines of a spatialsoft2d (or softsweep.py) summary file,
+    # "average probability of softsweep: p" and "average num clones: c"
+    try:
+        with open(path, "r") as f:
+            p, c = f.readline(), f.readline()
+        return float(p.split(":")[1]), float(c.split(":")[1])
+    except (OSError, IndexError, ValueError):
+        return np.nan, np.nan
+
+
+def read_summaries(input_folder, max_workers=16):
+    """
+    One row per input_folder/<graph_name>_<mu_rate>.txt summary file:
+    graph_name, mu_rate (as written in the file name), avg_softsweep_prob
+    and avg_num_clones. The files are read on a thread pool, since with
+    many small files the time is spent waiting on opens, and files without
+    the two summary lines are dropped.
+    """
+    files = sorted(f for f in os.listdir(input_folder) if f.endswith(".txt"))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        values = list(pool.map(_read_summary, [os.path.join(input_folder, f) for f in files]))
+
+    names = pd.Series(files, dtype=object).str[:-len(".txt")].str.rsplit("_", n=1)
+    df = pd.DataFrame({
+        "graph_name": names.str[0],
+        "mu_rate": names.str[-1],
+        "avg_softsweep_prob": [v[0] for v in values],
+        "avg_num_clones": [v[1] for v in values],
+    })
+    return df.dropna(subset=["avg_softsweep_prob", "avg_num_clones"]).reset_index(drop=True)
+
+
+def read_stats(stats_file="params.csv"):
+    """params.csv with graph names as stripped strings, for ingest."""
+    stats = pd.read_csv(stats_file, dtype={"graph_name": str})
+    stats["graph_name"] = stats["graph_name"].str.strip()
+    return stats
+
+
+def ingest(input_folder, graph_type, stats="params.csv", output_folder=None, max_workers=16):
+    """
+    reading.ipynb's process_files in one pass: read every summary file in
+    input_folder, merge them with the (graph_name, graph_type) rows of
+    stats (params.csv or its DataFrame), add the graph type's column from
+    NAME_COLUMNS and, for FILTERED_TYPES, drop graphs with connectivity 0
+    or amplification above 500. Writes output_folder/mu<mu_rate>.csv for
+    every rate when output_folder is given and returns the table.
+    Graphs missing from stats are printed and skipped.
+    """
+    if not isinstance(stats, pd.DataFrame):
+        stats = read_stats(stats)
+    df = read_summaries(input_folder, max_workers)
+
+    columns = ["graph_name", "degree_assortativity"] + list(STATS_COLUMNS)
+    stats = stats.loc[stats["graph_type"] == graph_type, columns].drop_duplicates("graph_name")
+    df = df.merge(stats, on="graph_name", how="left", indicator=True)
+    missing = df["_merge"] == "left_only"
+    for name in df.loc[missing, "graph_name"].unique():
+        print(name)
+    df = df[~missing].rename(columns=STATS_COLUMNS).rename(columns={"graph_name": "file_name"})
+
+    if graph_type in FILTERED_TYPES:
+        df = df[(df["connectivity"] != 0) & ~(df["amplification"] > 500)]
+
+    order = ["file_name", "avg_softsweep_prob", "avg_num_clones"] + list(STATS_COLUMNS.values())
+    if graph_type in NAME_COLUMNS:
+        column, parse = NAME_COLUMNS[graph_type]
+        df[column] = parse(df["file_name"])
+        order.append(column)
+    order.append("degree_assortativity")
+    df = df[order + ["mu_rate"]].reset_index(drop=True)
+
+    if output_folder is not None:
+        os.makedirs(output_folder, exist_ok=True)
+        for mu_rate, rows in df.groupby("mu_rate", sort=False):
+            rows[order].to_csv(os.path.join(output_folder, f"mu{mu_rate}.csv"), index=False)
+    return df
+
+
+def ingest_all(simulation_root="simulation_results", stats_file="params.csv", results_root="results", graph_types=None):
+    """
+    ingest simulation_root/<graph_type>_output into results_root/<graph_type>
+    for every graph type (default: every *_output folder), reading
+    stats_file once.
+    """
+    stats = read_stats(stats_file)
+    if graph_types is None:
+        graph_types = sorted(p.name[:-len("_output")] for p in Path(simulation_root).glob("*_output") if p.is_dir())
+    tables = {}
+    for graph_type in graph_types:
+        tables[graph_type] = ingest(
+            Path(simulation_root) / f"{graph_type}_output", graph_type, stats, Path(results_root) / graph_type
+        )
+        print(f"{graph_type}: {len(tables[graph_type])} rows")
+    return tables
+
+
+if __name__ == "__main__":
+    # python ingest.py [simulation_results] [params.csv] [results] [graph_type ...]
+    ingest_all(*sys.argv[1:4], graph_types=sys.argv[4:] or None)
@@ -1,14 +1,19 @@
 import numpy as np 
-import random
 import tqdm
 import math
+import time
+from checkpoint import save_checkpoint, load_checkpoint
+from observables import consume, lattice_observables
+from variants import VariantTable
 
 
 
-def linear_simulation(vector, new_idx, num_generation, dim, deme_pop, s, r, migration_prob, mutant_prob): 
-    rng = np.random.default_rng()
+def linear_simulation(vector, new_idx, num_generation, dim, deme_pop, s, r, migration_prob, mutant_prob, prune_every=10, rng=None): 
+    rng = np.random.default_rng(rng)
+    reclaimed = 0
 
-    for gen in  tqdm.tqdm(range(num_generation)):
+    progress = tqdm.tqdm(range(num_generation))
+    for gen in progress:
         i=0  
         #reproducing and mutating 
         for deme in vector:
@@ -49,7 +54,7 @@ def linear_simulation(vector, new_idx, num_generation, dim, deme_pop, s, r, migr
 
                 for m in range(migrate):
                     locations = [i-1, i+1]
-                    loc_idx = random.randint(0, 1)
+                    loc_idx = rng.integers(0, 2)
                     """
                     -------
                     |0|x|1|
@@ -75,5 +80,199 @@ def linear_simulation(vector, new_idx, num_generation, dim, deme_pop, s, r, migr
                     #print("pop" + str(pop))
                     #print("variant" + str(variant))
                     #print("pop" + str(deme[variant]))
-      
-    return vector, new_idx
\ No newline at end of file
+
+        #prune extinct variants so later generations do not iterate over them
+        if prune_every and (gen + 1) % prune_every == 0:
+            before = {variant for deme in vector for variant in deme}
+            for deme in vector:
+                for variant in [v for v, pop in deme.items() if pop == 0]:
+                    del deme[variant]
+            after = {variant for deme in vector for variant in deme}
+            reclaimed += len(before - after)
+            progress.set_postfix(live=len(after), reclaimed=reclaimed)
+
+    return vector, new_idx
+
+
+def vector_to_array(vector, dim):
+    """
+    Convert a length-dim vector of {variant: pop} dicts into a (dim, n_variants)
+    count array and the variant id of every column.
+    """
+    ids = sorted({variant for deme in vector for variant in deme})
+    column = {variant: c for c, variant in enumerate(ids)}
+    pop = np.zeros((dim, len(ids)), dtype=np.int64)
+    for i, deme in enumerate(vector):
+        for variant, count in deme.items():
+            pop[i, column[variant]] = count
+    return pop, np.array(ids, dtype=np.int64)
+
+
+def array_to_vector(pop, ids, vector):
+    """
+    Write a (dim, n_variants) count array back into the {variant: pop} dicts
+    of vector. Variants with a count of 0 are left out.
+    """
+    for i, deme in enumerate(pop):
+        nonzero = np.flatnonzero(deme)
+        vector[i] = dict(zip(ids[nonzero].tolist(), deme[nonzero].tolist()))
+    return vector
+
+
+def resample(pop, deme_pop, rng):
+    """
+    Resample every non-empty deme to exactly deme_pop individuals.
+
+    Demes above deme_pop are thinned with a multivariate hypergeometric draw
+    (sampling without replacement), demes below it are refilled with a
+    multinomial draw on the current frequencies. Both are drawn column by
+    column as conditional hypergeometric/binomial draws over all demes at once.
+    """
+    total = pop.sum(axis=1)
+    down = np.flatnonzero(total >= deme_pop)
+    up = np.flatnonzero((total > 0) & (total < deme_pop))
+
+    out = np.zeros_like(pop)
+    sample = np.full(len(pop), deme_pop, dtype=np.int64)
+    remaining = total.copy()
+    for c in range(pop.shape[1]):
+        col = pop[:, c]
+        out[down, c] = rng.hypergeometric(col[down], remaining[down] - col[down], sample[down])
+        p = np.divide(col[up], remaining[up], out=np.zeros(len(up)), where=remaining[up] > 0)
+        out[up, c] = rng.binomial(sample[up], p)
+        sample -= out[:, c]
+        remaining -= col
+    return out
+
+
+def linear_simulation_vectorized(vector, new_idx, num_generation, dim, deme_pop, s, r, migration_prob, mutant_prob, gc_every=1, rng=None, checkpoint_file=None, checkpoint_every=300, observe=None, observe_every=1):
+    """
+    Array-backed version of linear_simulation with the same arguments and
+    return value. Every generation costs O(dim * live variants): migration is
+    one binomial left/right split per (deme, variant), demes are resampled
+    exactly back to deme_pop and extinct variant columns are compacted away
+    every gc_every generations.
+
+    With checkpoint_file set, the full state is written there at most every
+    checkpoint_every seconds and after the last generation, with the number
+    of extinct variants reclaimed in its state; resume_linear_simulation
+    continues from it.
+
+    observe, if given, is called every observe_every generations with a dict
+    of observables (see observables.lattice_observables) together with the
+    number of variant columns held and of extinct variants reclaimed so
+    far, e.g.
+    observe=ColumnStore("trajectory").append to stream them to disk.
+    """
+    rng = np.random.default_rng(rng)
+
+    pop, ids = vector_to_array(vector, dim)
+    table = VariantTable(ids)
+    params = {
+        "num_generation": num_generation, "dim": dim, "deme_pop": deme_pop, "s": s, "r": r,
+        "migration_prob": migration_prob, "mutant_prob": mutant_prob, "gc_every": gc_every,
+    }
+    run = _run_linear(pop, table, new_idx, 0, params, rng, checkpoint_file, checkpoint_every,
+                    observe_every if observe is not None else 0)
+    pop, new_idx = consume(run, observe)
+
+    array_to_vector(pop, table.ids, vector)
+    return vector, new_idx
+
+
+def iter_linear_simulation(vector, new_idx, num_generation, dim, deme_pop, s, r, migration_prob, mutant_prob, every=1, gc_every=1, rng=None, checkpoint_file=None, checkpoint_every=300):
+    """
+    Generator form of linear_simulation_vectorized that yields the observables
+    every `every` generations while the run progresses, e.g. to follow the
+    clone count and mutant fraction over time in a single run. The final
+    state is written into vector once the generator is exhausted.
+    """
+    rng = np.random.default_rng(rng)
+
+    pop, ids = vector_to_array(vector, dim)
+    table = VariantTable(ids)
+    params = {
+        "num_generation": num_generation, "dim": dim, "deme_pop": deme_pop, "s": s, "r": r,
+        "migration_prob": migration_prob, "mutant_prob": mutant_prob, "gc_every": gc_every,
+    }
+    pop, new_idx = yield from _run_linear(pop, table, new_idx, 0, params, rng, checkpoint_file, checkpoint_every, every)
+    array_to_vector(pop, table.ids, vector)
+
+
+def resume_linear_simulation(checkpoint_file, num_generation=None, checkpoint_every=300, observe=None, observe_every=1):
+    """
+    Continue a linear_simulation_vectorized run from its checkpoint. The
+    result is identical to the uninterrupted run. num_generation can be
+    raised to extend a finished run. Returns a new vector and new_idx.
+    """
+    arrays, state, rng = load_checkpoint(checkpoint_file)
+    params = state["params"]
+    if num_generation is not None:
+        params["num_generation"] = num_generation
+
+    table = VariantTable(arrays["ids"])
+    table.reclaimed = state["reclaimed"]
+    run = _run_linear(arrays["pop"], table, state["new_idx"], state["gen"], params, rng,
+                      checkpoint_file, checkpoint_every, observe_every if observe is not None else 0)
+    pop, new_idx = consume(run, observe)
+
+    vector = np.empty(params["dim"], dtype=object)
+    array_to_vector(pop, table.ids, vector)
+    return vector, new_idx
+
+
+def _run_linear(pop, table, new_idx, start_gen, params, rng, checkpoint_file, checkpoint_every, observe_every):
+    # generator: yields observables every observe_every generations and
+    # returns the final (pop, new_idx)
+    dim, deme_pop, s, r = params["dim"], params["deme_pop"], params["s"], params["r"]
+    migration_prob, mutant_prob, gc_every = params["migration_prob"], params["mutant_prob"], params["gc_every"]
+    last_checkpoint = time.monotonic()
+
+    progress = tqdm.tqdm(range(start_gen, params["num_generation"]), initial=start_gen, total=params["num_generation"])
+    for gen in progress:
+        #reproducing and mutating
+        rates = np.where(table.ids == 0, r, r * (1 + s))
+        offspring = rng.binomial(pop, rates)
+        new = rng.binomial(offspring, mutant_prob)
+        pop += offspring - new
+
+        num_new = new.sum(axis=1)
+        total_new = int(num_new.sum())
+        if total_new:
+            #one new column per mutant, ids handed out deme by deme
+            mutants = np.zeros((dim, total_new), dtype=np.int64)
+            mutants[np.repeat(np.arange(dim), num_new), np.arange(total_new)] = 1
+            pop = np.concatenate([pop, mutants], axis=1)
+            new_idx = table.add(new_idx, total_new)
+
+        #migration: migrants leaving the ends of the line are lost
+        migrate = rng.binomial(pop, migration_prob)
+        left = rng.binomial(migrate, 0.5)
+        right = migrate - left
+        pop -= migrate
+        pop[:-1] += left[1:]
+        pop[1:] += right[:-1]
+
+        #sample down
+        pop = resample(pop, deme_pop, rng)
+
+        totals = None
+        if gc_every and (gen + 1) % gc_every == 0:
+            pop = pop[:, table.compact(pop)]
+            totals = table.totals
+            progress.set_postfix(live=len(table), reclaimed=table.reclaimed)
+
+        #checkpoint on the timer and after the last generation, so the final
+        #state, reclaimed count included, can be read back or extended
+        last_gen = gen + 1 == params["num_generation"]
+        if checkpoint_file and (last_gen or time.monotonic() - last_checkpoint >= checkpoint_every):
+            state = {"params": params, "gen": gen + 1, "new_idx": int(new_idx), "reclaimed": table.reclaimed}
+            save_checkpoint(checkpoint_file, {"pop": pop, "ids": table.ids}, state, rng)
+            last_checkpoint = time.monotonic()
+
+        if observe_every and (gen + 1) % observe_every == 0:
+            stats = {"generation": gen + 1, "new_idx": int(new_idx), "variants": len(table), "reclaimed": table.reclaimed}
+            stats.update(lattice_observables(pop, table.ids, totals))
+            yield stats
+
+    return pop, new_idx
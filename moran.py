@@ -0,0 +1,481 @@
+import ctypes
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from columnar import ColumnStore
+from csr_graph import read_edge_list
+from fenwick import FenwickTree
+from find_amplification import amplification_interval
+from fixation_results import record
+
+
+# the compiled engine, built from moran_kernel.cpp by build_kernel()
+KERNEL = Path(__file__).with_name("moran_kernel.so")
+
+
+def _load_kernel():
+    try:
+        lib = ctypes.CDLL(str(KERNEL))
+    except OSError:
+        return None
+    pointer = ctypes.POINTER
+    lib.moran_fixation.argtypes = [
+        ctypes.c_int, pointer(ctypes.c_int64), pointer(ctypes.c_int32), ctypes.c_double, ctypes.c_int,
+        ctypes.c_int64, ctypes.c_uint64, pointer(ctypes.c_int64), pointer(ctypes.c_double),
+    ]
+    lib.moran_fixation.restype = ctypes.c_int
+    return lib
+
+
+_kernel = _load_kernel()
+
+
+def build_kernel(compiler="g++"):
+    """Compile moran_kernel.cpp into KERNEL and load it."""
+    global _kernel
+    subprocess.run(
+        [compiler, "-O3", "-shared", "-fPIC", "-o", str(KERNEL), str(KERNEL.with_suffix(".cpp"))], check=True
+    )
+    _kernel = _load_kernel()
+    return _kernel is not None
+
+
+def default_method():
+    """"compiled" once the kernel is built, else the NumPy "batch" engine."""
+    return "compiled" if _kernel is not None else "batch"
+
+
+def _compiled_fixation(graph, trials, s, mode, rng):
+    if _kernel is None:
+        raise RuntimeError(f"{KERNEL} is not built; run moran.build_kernel()")
+    indptr = np.ascontiguousarray(graph.indptr, dtype=np.int64)
+    indices = np.ascontiguousarray(graph.indices, dtype=np.int32)
+    counts = np.zeros(2, dtype=np.int64)
+    times = np.zeros(2)
+    status = _kernel.moran_fixation(
+        graph.n, indptr.ctypes.data_as(ctypes.POINTER(ctypes.c_int64)),
+        indices.ctypes.data_as(ctypes.POINTER(ctypes.c_int32)), float(s), int(mode == "Bd"), int(trials),
+        int(rng.integers(2 ** 63)), counts.ctypes.data_as(ctypes.POINTER(ctypes.c_int64)),
+        times.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+    )
+    if status:
+        raise ValueError("Trial can neither fix nor go extinct: the graph is disconnected")
+    return counts, times
+
+
+def padded_neighbours(graph):
+    """
+    (n, max degree) array of neighbour ids, padded with the dummy node n so
+    that per-trial state arrays carry one extra, always-inert column.
+    """
+    degrees = graph.degrees()
+    width = max(int(degrees.max()), 1) if graph.n else 1
+    table = np.full((graph.n, width), graph.n, dtype=np.int64)
+    columns = np.arange(len(graph.indices)) - np.repeat(graph.indptr[:-1], degrees)
+    table[graph.sources(), columns] = graph.indices
+    return table
+
+
+class MoranBatch(object):
+    """
+    A fixed number of slots, each running an independent Moran trial on one
+    graph, advanced together.
+
+    Only events that change the population are simulated. Per slot the
+    state is the mutant indicator of every node and the number of mutant
+    neighbours of every node, from which each node's weight of starting an
+    active (opposite-type) event follows. An event is drawn directly among
+    the active pairs with its exact probability, and the same-type events
+    the step-by-step simulator would have spent in between are added to the
+    clock as one geometric draw. The resulting fixation counts and times
+    have the same distribution as Simulator::simulate (Bd) and
+    Simulator::simulate_dB (dB).
+
+    Node weights are kept in blocks of about sqrt(n) with per-block sums, so
+    a draw is one pass over the block sums and one over a block, and an
+    event only rewrites the weights of the changed node and its neighbours.
+    This is the NumPy reference engine for moran_kernel.cpp, which samples
+    the same events in compiled code and is much faster.
+    """
+
+    def __init__(self, graph, slots, s, mode, rng):
+        if mode not in ("Bd", "dB"):
+            raise ValueError(f"Unknown mode {mode!r}, expected 'Bd' or 'dB'")
+        self.n = graph.n
+        self.s = s
+        self.mode = mode
+        self.rng = rng
+        self.neighbours = padded_neighbours(graph)
+
+        # node n is an inert dummy used for padding
+        self.block = int(np.ceil(np.sqrt(self.n + 1)))
+        self.n_blocks = -(-(self.n + 1) // self.block)
+        width = self.n_blocks * self.block
+        self.degrees = np.zeros(width)
+        self.degrees[:self.n] = graph.degrees()
+
+        self.mutant = np.zeros((slots, width), dtype=np.int8)
+        self.mutant_neighbours = np.zeros((slots, width), dtype=np.int32)
+        self.weights = np.zeros((slots, width))
+        self.block_weights = np.zeros((slots, self.n_blocks))
+        self.mutants = np.zeros(slots, dtype=np.int64)
+        self.t = np.zeros(slots, dtype=np.int64)
+
+    def _node_weights(self, mutant, mutant_neighbours, degrees):
+        """
+        Weight of a node being the one that starts an active event: birth
+        at u (prob f_u / F) onto an opposite neighbour for Bd, death at v
+        (prob 1 / n) replaced from an opposite neighbour for dB.
+        """
+        opposite = np.where(mutant == 1, degrees - mutant_neighbours, mutant_neighbours)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if self.mode == "Bd":
+                weights = (1 + self.s * mutant) * opposite / degrees
+            else:
+                weights = opposite * (1 + self.s * (1 - mutant)) / (degrees + self.s * mutant_neighbours)
+        return np.where(degrees > 0, weights, 0.0)
+
+    def start(self, rows):
+        """Begin a new trial with one uniformly placed mutant in every slot of rows."""
+        first = self.rng.integers(0, self.n, len(rows))
+        self.mutant[rows] = 0
+        self.mutant[rows, first] = 1
+        self.mutant_neighbours[rows] = 0
+        self.mutant_neighbours[rows[:, None], self.neighbours[first]] = 1
+        self.mutant_neighbours[rows, self.n] = 0
+        self.weights[rows] = self._node_weights(self.mutant[rows], self.mutant_neighbours[rows], self.degrees)
+        self.block_weights[rows] = self.weights[rows].reshape(len(rows), self.n_blocks, self.block).sum(axis=2)
+        self.mutants[rows] = 1
+        self.t[rows] = 0
+
+    def step(self, rows):
+        """Advance the trials in rows by one population-changing event each."""
+        R = len(rows)
+        local = np.arange(R)
+
+        # steps until the next active event, counted like Simulator.h
+        blocks = np.cumsum(self.block_weights[rows], axis=1)
+        total = blocks[:, -1]
+        if np.any(total <= 0):
+            # block sums are recomputed exactly, so 0 means no boundary edge
+            # is left: the mutants fill a component of a disconnected graph
+            raise ValueError("Trial can neither fix nor go extinct: the graph is disconnected")
+        if self.mode == "Bd":
+            p_active = total / (self.n + self.s * self.mutants[rows])
+        else:
+            p_active = total / self.n
+        self.t[rows] += self.rng.geometric(np.minimum(p_active, 1.0))
+
+        # node starting the event: u giving birth (Bd) or v dying (dB)
+        block = (blocks <= (self.rng.random(R) * total)[:, None]).sum(axis=1)
+        block = np.minimum(block, self.n_blocks - 1)
+        columns = block[:, None] * self.block + np.arange(self.block)
+        inside = np.cumsum(self.weights[rows[:, None], columns], axis=1)
+        offset = (inside <= (self.rng.random(R) * inside[:, -1])[:, None]).sum(axis=1)
+        node = columns[local, np.minimum(offset, self.block - 1)]
+
+        # its partner is uniform among its opposite-type neighbours, which
+        # all have the same fitness
+        mutant = self.mutant[rows[:, None], self.neighbours[node]]
+        own = self.mutant[rows, node]
+        nb = self.neighbours[node]
+        opposite = (nb < self.n) & (mutant != own[:, None])
+        k = (self.rng.random(R) * opposite.sum(axis=1)).astype(np.int64)
+        partner = nb[local, (np.cumsum(opposite, axis=1) <= k[:, None]).sum(axis=1)]
+
+        if self.mode == "Bd":
+            changed, new_type = partner, own
+        else:
+            changed, new_type = node, 1 - own
+
+        self.mutant[rows, changed] = new_type
+        sign = 2 * new_type.astype(np.int32) - 1
+        self.mutants[rows] += sign
+        nb = self.neighbours[changed]
+        self.mutant_neighbours[rows[:, None], nb] += sign[:, None]
+        self.mutant_neighbours[rows, self.n] = 0
+
+        # only the changed node and its neighbours have new weights
+        touched = np.column_stack([changed, nb])
+        r = rows[:, None]
+        self.weights[r, touched] = self._node_weights(
+            self.mutant[r, touched], self.mutant_neighbours[r, touched], self.degrees[touched]
+        )
+        # block sums are recomputed rather than updated, so round-off
+        # cannot accumulate over a long trial
+        touched_blocks = touched // self.block
+        columns = touched_blocks[:, :, None] * self.block + np.arange(self.block)
+        self.block_weights[r, touched_blocks] = self.weights[r[:, :, None], columns].sum(axis=2)
+
+
+class KineticMoran(object):
+    """
+    One Moran trial at a time, sampled rejection-free over the directed
+    boundary edges u -> v (u and v of opposite type) of the graph.
+
+    Every stored CSR entry is one directed edge, u replacing v, weighted by
+    the probability of that event in one step of the simulator: for Bd
+    f_u / deg_u (over the total fitness F), for dB f_u / S_v (over n) with
+    S_v the fitness summed over the neighbours of v. The weights live in a
+    FenwickTree, so drawing an event and updating one edge are O(log m);
+    edges inside a same-type region have weight 0 and are never drawn. Time
+    advances by the geometric number of steps up to the event, as in
+    MoranBatch.
+
+    An event touches O(degree) edges (O(degree^2) for dB), so the loop runs
+    on Python scalars: per event that is far cheaper than NumPy calls, but
+    still slower than ./main. Like MoranBatch it is a reference engine.
+    """
+
+    def __init__(self, graph, s, mode, rng):
+        if mode not in ("Bd", "dB"):
+            raise ValueError(f"Unknown mode {mode!r}, expected 'Bd' or 'dB'")
+        self.n = graph.n
+        self.s = s
+        self.mode = mode
+        self.rng = rng
+        sources = graph.sources().astype(np.int64)
+        targets = np.asarray(graph.indices, dtype=np.int64)
+        # position of v -> u for every entry u -> v; entries are sorted by
+        # (source, target), so this is a search on the same key
+        keys = sources * self.n + targets
+        self.reverse = np.searchsorted(keys, targets * self.n + sources).tolist()
+        self.indptr = np.asarray(graph.indptr).tolist()
+        self.sources = sources.tolist()
+        self.targets = targets.tolist()
+        self.degrees = graph.degrees().tolist()
+        self.tree = FenwickTree(len(targets))
+
+    def _weight(self, entry, mutant, mutant_neighbours):
+        u, v = self.sources[entry], self.targets[entry]
+        if mutant[u] == mutant[v]:
+            return 0.0
+        if self.mode == "Bd":
+            return (1 + self.s * mutant[u]) / self.degrees[u]
+        return (1 + self.s * mutant[u]) / (self.degrees[v] + self.s * mutant_neighbours[v])
+
+    def run(self):
+        """One trial from a uniformly placed mutant: (fixed, steps)."""
+        n, s, rng, tree = self.n, self.s, self.rng, self.tree
+        indptr, targets, reverse = self.indptr, self.targets, self.reverse
+        # also drops the round-off the previous trial left in the partial sums
+        tree.clear()
+        mutant = [0] * n
+        mutant_neighbours = [0] * n
+
+        changed = int(rng.integers(n))
+        mutant[changed] = 1
+        mutants, t = 1, 0
+        while True:
+            out = range(indptr[changed], indptr[changed + 1])
+            sign = 1 if mutant[changed] else -1
+            for e in out:
+                mutant_neighbours[targets[e]] += sign
+
+            # edges touching the changed node switch boundary status; for dB
+            # the denominators S_w of its neighbours change as well
+            entries = [e for e in out] + [reverse[e] for e in out]
+            if self.mode == "dB":
+                for e in out:
+                    w = targets[e]
+                    entries.extend(reverse[f] for f in range(indptr[w], indptr[w + 1]))
+            for e in entries:
+                tree.update(e, self._weight(e, mutant, mutant_neighbours))
+
+            if mutants == 0 or mutants == n:
+                return mutants == n, t
+
+            # any real edge weight is at least 1 / ((1 + s) * max degree);
+            # below that the total is round-off left by the last updates
+            total = tree.total()
+            if total <= 1e-9:
+                raise ValueError("Trial can neither fix nor go extinct: the graph is disconnected")
+            if self.mode == "Bd":
+                p_active = total / (n + s * mutants)
+            else:
+                p_active = total / n
+            t += int(rng.geometric(min(p_active, 1.0)))
+
+            # round-off can land on a zero-weight neighbour; redraw those
+            entry = tree.find_one(rng.random() * total)
+            while tree.weights[entry] <= 0:
+                entry = tree.find_one(rng.random() * total)
+            changed = targets[entry]
+            mutant[changed] = mutant[self.sources[entry]]
+            mutants += 1 if mutant[changed] else -1
+
+
+def fixation(graph, trials, s, mode="Bd", rng=None, batch=4096, method=None):
+    """
+    Run trials Moran processes from one random mutant and return
+    (counts, times): counts[1] fixations and counts[0] extinctions, and the
+    summed number of steps of each, counted like Simulator.h (every
+    birth-death or death-birth step, including ones that change nothing).
+
+    method="compiled", the default once moran_kernel.so is built (see
+    build_kernel), runs the trials in moran_kernel.cpp, which simulates only
+    the population-changing events at O(degree) cost each and is the engine
+    that beats ./main: on 1000-node graphs with s = 0.001 it takes about a
+    half to a quarter of the time of ./main on a random 4-regular graph, a
+    ninth on a 20 x 50 grid and a few hundredth on lines_2, where ./main
+    spends nearly all its steps inside same-type regions. The NumPy engines
+    below are reference implementations and are much slower than ./main;
+    without the kernel the default is "batch".
+
+    method="batch" runs batch trials at a time in a MoranBatch; a slot whose
+    trial has ended starts the next one, so the few long fixating trials
+    overlap with the many short ones instead of holding up a whole batch.
+    method="kmc" runs the trials one by one in a KineticMoran, whose cost
+    per event grows with log m rather than sqrt(n), for large sparse graphs
+    such as lines_2 and fingers.
+
+    Both raise ValueError on a disconnected graph once a trial is left with
+    no boundary edge, as it can then neither fix nor go extinct.
+    """
+    rng = np.random.default_rng(rng)
+    method = method or default_method()
+    if mode not in ("Bd", "dB"):
+        raise ValueError(f"Unknown mode {mode!r}, expected 'Bd' or 'dB'")
+    if method == "compiled":
+        return _compiled_fixation(graph, trials, s, mode, rng)
+    counts = np.zeros(2, dtype=np.int64)
+    times = np.zeros(2)
+    if method == "kmc":
+        sim = KineticMoran(graph, s, mode, rng)
+        for _ in range(trials):
+            fixed, t = sim.run()
+            counts[int(fixed)] += 1
+            times[int(fixed)] += t
+        return counts, times
+    if method != "batch":
+        raise ValueError(f"Unknown method {method!r}, expected 'compiled', 'batch' or 'kmc'")
+
+    sim = MoranBatch(graph, min(batch, trials), s, mode, rng)
+    rows = np.arange(min(batch, trials))
+    sim.start(rows)
+    started = len(rows)
+    while len(rows):
+        sim.step(rows)
+        mutants = sim.mutants[rows]
+        done = (mutants == 0) | (mutants == sim.n)
+        if not done.any():
+            continue
+        ended = rows[done]
+        fixed = sim.mutants[ended] == sim.n
+        counts += [np.count_nonzero(~fixed), np.count_nonzero(fixed)]
+        times += [sim.t[ended[~fixed]].sum(), sim.t[ended[fixed]].sum()]
+        restart = ended[:trials - started]
+        if len(restart):
+            sim.start(restart)
+            started += len(restart)
+        rows = np.concatenate([rows[~done], restart])
+    return counts, times
+
+
+def adaptive_fixation(graph, s, mode="Bd", rel_width=0.05, max_trials=100000, min_trials=1000, z=1.96, rng=None, batch=4096, method=None):
+    """
+    fixation() in rounds until the amplification estimate is pinned down:
+    stops once the interval of find_amplification.amplification_interval
+    (the Wilson interval of the fixation count mapped to alpha) is at most
+    rel_width times |alpha| wide, or after max_trials trials.
+
+    The first round runs min_trials trials; each later one runs the number
+    the 1/sqrt(trials) shrinking of the interval predicts is still needed,
+    at most doubling the total, so a graph whose estimate never settles
+    (alpha near 0, or fixation too rare to observe) uses the full budget.
+    Returns (counts, times) like fixation().
+    """
+    rng = np.random.default_rng(rng)
+    counts = np.zeros(2, dtype=np.int64)
+    times = np.zeros(2)
+    chunk = min(min_trials, max_trials)
+    while chunk > 0:
+        c, t = fixation(graph, chunk, s, mode, rng, batch, method)
+        counts += c
+        times += t
+        total = int(counts.sum())
+        alpha, low, high = amplification_interval(counts[1], total, s, graph.n, z)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            width = (high - low) / abs(alpha)
+        if np.isfinite(width) and width <= rel_width:
+            break
+        if np.isfinite(width) and width > 0:
+            needed = int(np.ceil(total * (width / rel_width) ** 2)) - total
+        else:
+            needed = total
+        chunk = min(max(needed, min_trials), total, max_trials - total)
+    return counts, times
+
+
+def simulate(graph, trials, s, mode="Bd", rng=None, batch=4096, method=None, rel_width=None):
+    """
+    One output row (s, counts[0], counts[1], times[0], times[1], rt) as
+    written by Simulator::save, with times averaged per outcome. With
+    rel_width set, trials is the budget of adaptive_fixation instead of a
+    fixed count.
+    """
+    start = time.perf_counter()
+    if rel_width is None:
+        counts, times = fixation(graph, trials, s, mode, rng, batch, method)
+    else:
+        counts, times = adaptive_fixation(graph, s, mode, rel_width, trials, rng=rng, batch=batch, method=method)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        times = times / counts
+    rt = time.perf_counter() - start
+    return s, int(counts[0]), int(counts[1]), float(times[0]), float(times[1]), rt
+
+
+def save_row(f, row):
+    s, count0, count1, time0, time1, rt = row
+    f.write(f"{s:g}\t{count0}\t{count1}\t{time0:g}\t{time1:g}\t{rt:g}\n")
+
+
+def main(input_file, output_file, runs, *s_values, rng=None, method=None, results=None, replicate=0, rel_width=None):
+    """
+    Same arguments and output file as the Evograph binary: Bd rows for every
+    s, then dB rows. With results set (a fixation_results store directory)
+    every row is also appended there under the graph's family (the input
+    file's directory) and name (its stem). With rel_width set, runs is the
+    per-row budget of adaptive_fixation and the trials used are printed.
+    """
+    graph = read_edge_list(input_file)
+    rng = np.random.default_rng(rng)
+    store = ColumnStore(results) if results is not None else None
+    print(input_file)
+    print(runs)
+    with open(output_file, "w") as f:
+        for mode in ("Bd", "dB"):
+            for s in s_values:
+                print(s)
+                row = simulate(graph, runs, s, mode, rng, method=method, rel_width=rel_width)
+                print("%f : %d,\t%d,\t%f,\t%f,\t%f" % row)
+                if rel_width is not None:
+                    print(f"{input_file} {mode} s={s}: {row[1] + row[2]} of {runs} trials")
+                save_row(f, row)
+                f.flush()
+                if store is not None:
+                    path = Path(input_file)
+                    record(store, path.parent.name, path.stem, row, graph.n, mode, replicate)
+
+
+if __name__ == "__main__":
+    # options: --batch and --kmc select the NumPy engines instead of the
+    # compiled one, --results=DIR and
+    # --replicate=K also append the rows to a fixation result table,
+    # --rel-width=W stops each row early once amp is known to within W
+    options = dict(a[2:].partition("=")[::2] for a in sys.argv[1:] if a.startswith("--"))
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if len(args) < 4:
+        print("Not enough arguments!")
+        sys.exit(1)
+    main(
+        args[0], args[1], int(args[2]), *(float(v) for v in args[3:]),
+        method="kmc" if "kmc" in options else "batch" if "batch" in options else None,
+        results=options.get("results"),
+        replicate=int(options.get("replicate", 0)),
+        rel_width=float(options["rel-width"]) if "rel-width" in options else None
+    )
@@ -0,0 +1,195 @@
+//  moran_kernel
+//
+//  Rejection-free Moran fixation trials for moran.py, loaded with ctypes.
+//  Build next to moran.py with
+//      g++ -O3 -shared -fPIC -o moran_kernel.so moran_kernel.cpp
+//  (or moran.build_kernel()).
+//
+//  Every node carries the weight of being the node that starts a
+//  population-changing event, as in moran.MoranBatch: birth at u onto an
+//  opposite-type neighbour for Bd, f_u * opposite_u / deg_u (over the total
+//  fitness F), and death at v replaced from an opposite-type neighbour for
+//  dB, (opposite fitness around v) / S_v (over n), S_v being the fitness
+//  summed over the neighbours of v. Both are at most 1 + |s|, so the node
+//  of the next event is drawn uniformly from the nodes with positive weight
+//  and accepted with probability weight / (1 + |s|); the nodes with positive
+//  weight are kept in an array with each node's position, so inserting and
+//  removing one is O(1). An event then costs a few draws, a scan of one
+//  neighbour list and deg + 1 O(1) weight updates, and the steps of
+//  Simulator.h that change nothing in between are added to the clock as one
+//  geometric draw.
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <vector>
+
+using namespace std;
+
+namespace {
+
+struct Random {
+    // xoshiro256+, seeded through splitmix64
+    uint64_t state[4];
+
+    explicit Random(uint64_t seed) {
+        for (auto &x : state) {
+            uint64_t z = (seed += 0x9e3779b97f4a7c15ULL);
+            z = (z ^ (z >> 30)) * 0xbf58476d1ce4e5b9ULL;
+            z = (z ^ (z >> 27)) * 0x94d049bb133111ebULL;
+            x = z ^ (z >> 31);
+        }
+    }
+
+    uint64_t next() {
+        uint64_t result = state[0] + state[3];
+        uint64_t t = state[1] << 17;
+        state[2] ^= state[0];
+        state[3] ^= state[1];
+        state[1] ^= state[2];
+        state[0] ^= state[3];
+        state[2] ^= t;
+        state[3] = (state[3] << 45) | (state[3] >> 19);
+        return result;
+    }
+
+    // uniform in [0, 1)
+    double uniform() { return (next() >> 11) * 0x1.0p-53; }
+};
+
+struct Trial {
+    int n;
+    const int64_t *indptr;
+    const int32_t *indices;
+    double s, max_weight;
+    bool bd;
+    vector<int> degree;
+    vector<char> mutant;
+    vector<int> mutant_neighbours;
+    vector<double> weights;
+    // nodes with positive weight, and every node's place in it (-1 if none)
+    vector<int> active, position;
+    double total;
+
+    Trial(int n, const int64_t *indptr, const int32_t *indices, double s, bool bd)
+        : n(n), indptr(indptr), indices(indices), s(s), max_weight(1 + fabs(s)), bd(bd),
+          degree(n), mutant(n), mutant_neighbours(n), weights(n), position(n), total(0) {
+        for (int u = 0; u < n; ++u)
+            degree[u] = (int)(indptr[u + 1] - indptr[u]);
+    }
+
+    double weight(int u) const {
+        int opposite = mutant[u] ? degree[u] - mutant_neighbours[u] : mutant_neighbours[u];
+        if (opposite == 0)
+            return 0.0;
+        if (bd)
+            return (1 + s * mutant[u]) * opposite / degree[u];
+        return opposite * (1 + s * (1 - mutant[u])) / (degree[u] + s * mutant_neighbours[u]);
+    }
+
+    void update(int u) {
+        double w = weight(u);
+        total += w - weights[u];
+        weights[u] = w;
+        if (w > 0 && position[u] < 0) {
+            position[u] = (int)active.size();
+            active.push_back(u);
+        } else if (w == 0 && position[u] >= 0) {
+            int last = active.back();
+            active[position[u]] = last;
+            position[last] = position[u];
+            active.pop_back();
+            position[u] = -1;
+        }
+    }
+
+    void flip(int u) {
+        mutant[u] ^= 1;
+        int sign = mutant[u] ? 1 : -1;
+        for (int64_t e = indptr[u]; e < indptr[u + 1]; ++e)
+            mutant_neighbours[indices[e]] += sign;
+        update(u);
+        for (int64_t e = indptr[u]; e < indptr[u + 1]; ++e)
+            update(indices[e]);
+    }
+
+    // 1 for fixation, 0 for extinction, -1 if the trial can end neither way
+    int run(Random &rng, double &t) {
+        active.clear();
+        fill(mutant.begin(), mutant.end(), 0);
+        fill(mutant_neighbours.begin(), mutant_neighbours.end(), 0);
+        fill(weights.begin(), weights.end(), 0.0);
+        fill(position.begin(), position.end(), -1);
+        total = 0;
+
+        flip((int)(rng.uniform() * n) % n);
+        int mutants = 1;
+        int64_t events = 0;
+        t = 0;
+
+        while (mutants != 0 && mutants != n) {
+            if (active.empty())
+                return -1;
+            if (++events % n == 0) {
+                // the running total is resummed now and then so round-off
+                // cannot build up over a long trial
+                total = 0;
+                for (int u : active)
+                    total += weights[u];
+            }
+
+            // steps up to and including the next active one
+            double p = bd ? total / (n + s * mutants) : total / n;
+            if (p < 1)
+                t += 1 + floor(log(rng.uniform()) / log1p(-p));
+            else
+                t += 1;
+
+            int node;
+            // one 64-bit draw per try: the high half picks the node, the low
+            // half accepts it
+            uint64_t size = active.size(), r;
+            do {
+                r = rng.next();
+                node = active[((r >> 32) * size) >> 32];
+            } while ((r & 0xffffffffULL) * 0x1.0p-32 * max_weight >= weights[node]);
+
+            // its partner is uniform among its opposite-type neighbours,
+            // which all have the same fitness
+            int own = mutant[node];
+            int opposite = own ? degree[node] - mutant_neighbours[node] : mutant_neighbours[node];
+            int k = (int)(rng.uniform() * opposite) % opposite;
+            int partner = node;
+            for (int64_t e = indptr[node]; e < indptr[node + 1]; ++e) {
+                if (mutant[indices[e]] != own && k-- == 0) {
+                    partner = indices[e];
+                    break;
+                }
+            }
+
+            int changed = bd ? partner : node;
+            flip(changed);
+            mutants += mutant[changed] ? 1 : -1;
+        }
+        return mutants == n;
+    }
+};
+
+}  // namespace
+
+extern "C" int moran_fixation(int n, const int64_t *indptr, const int32_t *indices, double s, int bd,
+                              int64_t trials, uint64_t seed, int64_t *counts, double *times) {
+    // adds to counts and times as moran.fixation returns them; returns 1 if
+    // a trial could neither fix nor go extinct (a disconnected graph), else 0
+    Random rng(seed);
+    Trial trial(n, indptr, indices, s, bd != 0);
+    for (int64_t i = 0; i < trials; ++i) {
+        double t;
+        int fixed = trial.run(rng, t);
+        if (fixed < 0)
+            return 1;
+        counts[fixed] += 1;
+        times[fixed] += t;
+    }
+    return 0;
+}
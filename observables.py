@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def variant_observables(totals, ids):
+    """
+    Summary statistics from the total count of every variant: number of live
+    mutant clones, total mutant fraction, Simpson diversity (probability
+    that two random individuals carry different variants) and soft-sweep
+    probability (probability that two random mutants descend from different
+    mutations, as in spatialsoft2d).
+    """
+    totals = np.asarray(totals, dtype=float)
+    total = totals.sum()
+    if total == 0:
+        return {"clones": 0, "mutant_fraction": np.nan, "simpson": np.nan, "softsweep_prob": np.nan}
+    mutant = totals[np.asarray(ids) != 0]
+    mutants = mutant.sum()
+    return {
+        "clones": int((mutant > 0).sum()),
+        "mutant_fraction": float(mutants / total),
+        "simpson": float(1 - ((totals / total) ** 2).sum()),
+        "softsweep_prob": float(1 - ((mutant / mutants) ** 2).sum()) if mutants else np.nan,
+    }
+
+
+def lattice_observables(pop, ids, totals=None):
+    """
+    Observables of a lattice count array with the variant axis last: the
+    global statistics of variant_observables plus the mean within-deme
+    Simpson diversity. totals, the count of every variant over the lattice,
+    is taken as given when the caller has it already (VariantTable.compact
+    leaves it in VariantTable.totals), saving a pass over pop.
+    """
+    # the variant axis can be empty, so -1 cannot stand for the deme axis
+    demes = pop.reshape(int(np.prod(pop.shape[:-1])), pop.shape[-1])
+    stats = variant_observables(demes.sum(axis=0) if totals is None else totals, ids)
+
+    sizes = demes.sum(axis=1)
+    occupied = sizes > 0
+    freqs = demes[occupied] / sizes[occupied, None]
+    stats["deme_simpson"] = float(np.mean(1 - (freqs ** 2).sum(axis=1))) if occupied.any() else np.nan
+    return stats
+
+
+def consume(run, observe=None):
+    """
+    Drive a simulation generator to the end, handing every yielded set of
+    observables to observe, and return the generator's final value.
+    """
+    while True:
+        try:
+            stats = next(run)
+        except StopIteration as stop:
+            return stop.value
+        if observe is not None:
+            observe(stats)
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partialmethod
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+import tqdm
+
+from checkpoint import truncate_partial_line
+from grid_simulation import grid_simulation, grid_simulation_vectorized
+from linear_simulation import linear_simulation, linear_simulation_vectorized
+from observables import variant_observables
+
+# name -> (simulation function, lattice dimension)
+SIMULATIONS = {
+    "grid": (grid_simulation_vectorized, 2),
+    "linear": (linear_simulation_vectorized, 1),
+    "grid_dict": (grid_simulation, 2),
+    "linear_dict": (linear_simulation, 1),
+}
+
+PARAMETERS = ["num_generation", "dim", "deme_pop", "s", "r", "migration_prob", "mutant_prob"]
+
+
+def parameter_grid(**values):
+    """
+    Cartesian product of parameter values, e.g.
+    parameter_grid(s=[0.05, 0.1], mutant_prob=[1e-7, 1e-6], dim=[100], ...)
+    gives one dict per combination, in a fixed order.
+    """
+    names = list(values)
+    return [dict(zip(names, combo)) for combo in product(*(values[n] for n in names))]
+
+
+def initial_demes(dim, deme_pop, lattice_dim):
+    """
+    Lattice of wild-type demes in the format the simulations expect.
+    """
+    shape = (dim,) * lattice_dim
+    demes = np.empty(shape, dtype=object)
+    for idx in np.ndindex(shape):
+        demes[idx] = {0: deme_pop}
+    return demes
+
+
+def summarize(demes, new_idx):
+    """
+    Summary statistics of a final lattice of {variant: pop} dicts (see
+    observables.variant_observables).
+    """
+    totals = Counter()
+    for deme in np.ravel(demes):
+        totals.update(deme)
+    stats = {"new_idx": int(new_idx)}
+    stats.update(variant_observables(list(totals.values()), list(totals.keys())))
+    return stats
+
+
+def _params_key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def _seed(entropy, params, replicate):
+    # derived from the parameter values, so reordering or extending the grid
+    # or the replicate count keeps every job's stream unchanged
+    digest = hashlib.sha1(_params_key(params).encode()).digest()
+    return np.random.SeedSequence(entropy, spawn_key=(int.from_bytes(digest[:8], "little"), replicate))
+
+
+def _disable_progress():
+    # one tqdm bar per worker would interleave on the terminal
+    tqdm.tqdm.__init__ = partialmethod(tqdm.tqdm.__init__, disable=True)
+
+
+def _run_replicate(simulation, params, replicate, seed):
+    function, lattice_dim = SIMULATIONS[simulation]
+    rng = np.random.default_rng(seed)
+
+    start = time.perf_counter()
+    demes = initial_demes(params["dim"], params["deme_pop"], lattice_dim)
+    demes, new_idx = function(demes, 1, *(params[p] for p in PARAMETERS), rng=rng)
+    row = {
+        "replicate": replicate,
+        "simulation": simulation,
+        "params": params,
+        "entropy": str(seed.entropy),
+        "spawn_key": list(seed.spawn_key),
+    }
+    row.update(summarize(demes, new_idx))
+    row["seconds"] = time.perf_counter() - start
+    return row
+
+
+def _completed(output_file):
+    done = set()
+    entropy = None
+    if not output_file.exists():
+        return done, entropy
+    with open(output_file, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                # a half-written last line from a crash; the job reruns
+                continue
+            done.add((_params_key(row["params"]), row["replicate"]))
+            entropy = int(row["entropy"])
+    return done, entropy
+
+
+def run_replicates(
+    grid,
+    n_replicates,
+    output_file="replicates.jsonl",
+    simulation="grid",
+    seed=None,
+    max_workers=None
+):
+    """
+    Run n_replicates of simulation for every parameter dict in grid on a
+    process pool. Every (parameters, replicate) job gets its own generator
+    spawned from one root SeedSequence, so results do not depend on
+    scheduling or on the number of workers.
+
+    One JSON line per finished job is appended to output_file as soon as it
+    completes. Rerunning with the same arguments skips the jobs already in
+    the file and reuses its root seed, so an interrupted sweep resumes where
+    it stopped and gives the same results as an uninterrupted one. A job
+    that raises is reported and left out of the file, so the others still
+    finish and a rerun retries it.
+    """
+    if simulation not in SIMULATIONS:
+        raise ValueError(f"Unknown simulation {simulation!r}, expected one of {list(SIMULATIONS)}")
+    for params in grid:
+        missing = [p for p in PARAMETERS if p not in params]
+        if missing:
+            raise ValueError(f"Missing parameters {missing} in {params}")
+
+    output_file = Path(output_file)
+    # a crash mid-write leaves a last line without its newline; it is cut
+    # before counting finished jobs, so a record that happens to parse but
+    # is cut here reruns, and the rows appended below start on a new line
+    truncate_partial_line(output_file)
+    done, entropy = _completed(output_file)
+    if entropy is not None and seed is not None and entropy != seed:
+        raise ValueError(f"{output_file} was started with seed {entropy}, not {seed}")
+    if entropy is None:
+        entropy = seed if seed is not None else np.random.SeedSequence().entropy
+
+    jobs = [(params, k) for params in grid for k in range(n_replicates)]
+    todo = [(params, k) for params, k in jobs if (_params_key(params), k) not in done]
+    print(f"{len(jobs) - len(todo)} of {len(jobs)} jobs already in {output_file}, running {len(todo)}")
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_disable_progress) as pool, \
+            open(output_file, "a") as out:
+        futures = {
+            pool.submit(_run_replicate, simulation, params, k, _seed(entropy, params, k)): (params, k)
+            for params, k in todo
+        }
+        failed = 0
+        for i, future in enumerate(as_completed(futures), 1):
+            params, k = futures[future]
+            try:
+                row = future.result()
+            except Exception as e:
+                # not written, so the job reruns on resume
+                failed += 1
+                print(f"{i}/{len(todo)} replicate {k} of {params} failed: {e!r}")
+                continue
+            out.write(json.dumps(row) + "\n")
+            out.flush()
+            print(f"{i}/{len(todo)} replicate {row['replicate']} of {row['params']} done in {row['seconds']:.1f}s")
+
+    if failed:
+        print(f"{failed} of {len(todo)} jobs failed; rerun to retry them")
+    return output_file
@@ -0,0 +1,390 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from csr_graph import read_edge_list
+from fenwick import FenwickTree
+from moran import padded_neighbours
+
+EMPTY = -1
+
+
+class SoftSweepBatch(object):
+    """
+    A fixed number of slots, each running an independent soft sweep of
+    spatialsoft2d on one graph, advanced together.
+
+    Every step each slot either seeds a new colour on a uniform empty site
+    (probability mutrate * (n - N) / N with N occupied sites, always for the
+    first site) or picks a uniform occupied site and copies its colour to a
+    uniform neighbour if that neighbour is empty, as in the replicate loop of
+    spatialsoft2d.cpp. A sweep ends once every site is occupied.
+
+    All arrays are allocated once: colours per site (with an always-occupied
+    dummy column n that padded neighbour lists point to), occupied sites in
+    order, and the empty sites with each one's position, so both random
+    picks are O(1). A finished slot is reset for the next replicate by
+    clearing only what the sweep wrote.
+
+    mutrate is one rate for every slot or an array of one per slot, so
+    sweeps at several rates can share a batch (see rate_sweep_moments).
+    """
+
+    def __init__(self, graph, slots, mutrate, rng):
+        self.n = graph.n
+        self.mutrate = np.broadcast_to(np.asarray(mutrate, dtype=float), (slots,)).copy()
+        self.rng = rng
+        self.neighbours = padded_neighbours(graph)
+        self.degrees = graph.degrees()
+
+        self.colour = np.full((slots, self.n + 1), EMPTY, dtype=np.int32)
+        self.colour[:, self.n] = 0
+        self.occupied = np.zeros((slots, self.n), dtype=np.int64)
+        self.empties = np.tile(np.arange(self.n, dtype=np.int64), (slots, 1))
+        self.position = self.empties.copy()
+        self.size = np.zeros(slots, dtype=np.int64)
+        self.colours = np.zeros(slots, dtype=np.int64)
+
+    def reset(self, rows):
+        """Empty the slots in rows for a new replicate."""
+        r = rows[:, None]
+        # a finished sweep has occupied every site, so its occupied list is
+        # the set of sites to clear and a valid order for the empty list
+        written = self.occupied[rows]
+        self.colour[r, written] = EMPTY
+        self.empties[rows] = written
+        self.position[r, written] = np.arange(self.n)
+        self.size[rows] = 0
+        self.colours[rows] = 0
+
+    def _occupy(self, rows, sites, colours):
+        n_empty = self.n - self.size[rows]
+        self.colour[rows, sites] = colours
+        self.occupied[rows, self.size[rows]] = sites
+        # swap the site out of the empty list with its last entry
+        position = self.position[rows, sites]
+        last = self.empties[rows, n_empty - 1]
+        self.empties[rows, position] = last
+        self.position[rows, last] = position
+        self.size[rows] += 1
+
+    def step(self, rows):
+        """One event in every slot of rows."""
+        size = self.size[rows]
+        with np.errstate(divide="ignore"):
+            p_mutate = self.mutrate[rows] * (self.n - size) / size
+        mutate = self.rng.random(len(rows)) < p_mutate
+
+        r = rows[mutate]
+        if len(r):
+            k = (self.rng.random(len(r)) * (self.n - self.size[r])).astype(np.int64)
+            self._occupy(r, self.empties[r, k], self.colours[r])
+            self.colours[r] += 1
+
+        r = rows[~mutate]
+        if len(r):
+            k = (self.rng.random(len(r)) * self.size[r]).astype(np.int64)
+            source = self.occupied[r, k]
+            pick = (self.rng.random(len(r)) * self.degrees[source]).astype(np.int64)
+            target = self.neighbours[source, pick]
+            free = self.colour[r, target] == EMPTY
+            self._occupy(r[free], target[free], self.colour[r[free], source[free]])
+
+    def match_probability(self, rows):
+        """Sum of squared colour frequencies of the finished sweeps in rows."""
+        out = np.empty(len(rows))
+        for i, row in enumerate(rows):
+            counts = np.bincount(self.colour[row, :self.n])
+            out[i] = np.sum((counts / self.n) ** 2)
+        return out
+
+
+class RejectionFreeSweep(object):
+    """
+    One soft sweep at a time, simulating only the events that occupy a site.
+
+    A jump from occupied site i lands on an empty site with probability
+    e_i / deg_i (e_i empty neighbours), so with N sites occupied a step of
+    spatialsoft2d seeds a colour with probability p = mutrate * (n - N) / N
+    and fills a site by a jump with probability q = (1 - p) / N * W, where
+    W sums e_i / deg_i over occupied sites. Steps doing neither change
+    nothing and nothing recorded depends on time, so each event here is a
+    seed with probability p / (p + q) and otherwise a jump from i drawn in
+    proportion to e_i / deg_i onto a uniform empty neighbour. Those weights
+    live in a FenwickTree over sites: one draw and the O(degree) updates
+    after an event are O(log n) each, and a sweep costs exactly n events
+    however many jumps SoftSweepBatch would have wasted.
+    """
+
+    def __init__(self, graph, mutrate, rng):
+        self.n = graph.n
+        self.mutrate = mutrate
+        self.rng = rng
+        indptr = np.asarray(graph.indptr).tolist()
+        indices = np.asarray(graph.indices).tolist()
+        self.neighbours = [indices[indptr[u]:indptr[u + 1]] for u in range(self.n)]
+        self.degrees = graph.degrees().tolist()
+        self.tree = FenwickTree(self.n)
+
+    def run(self):
+        """One sweep: (sum of squared colour frequencies, number of colours)."""
+        n, rng, tree = self.n, self.rng, self.tree
+        neighbours, degrees = self.neighbours, self.degrees
+        tree.clear()
+        colour = [EMPTY] * n
+        empty_neighbours = list(degrees)
+        empties = list(range(n))
+        position = list(range(n))
+        colours = 0
+
+        for size in range(n):
+            p = 1.0 if size == 0 else min(1.0, self.mutrate * (n - size) / size)
+            # any real jump weight is at least 1 / max degree; below that the
+            # total is round-off left after the last empty neighbour filled
+            total = tree.total() if tree.total() > 1e-9 else 0.0
+            q = 0.0 if size == 0 else (1 - p) / size * total
+            if rng.random() * (p + q) < p:
+                site = empties[int(rng.random() * len(empties))]
+                new_colour = colours
+                colours += 1
+            else:
+                # round-off can land on a zero-weight site; redraw those
+                source = tree.find_one(rng.random() * total)
+                while tree.weights[source] <= 0:
+                    source = tree.find_one(rng.random() * total)
+                free = [v for v in neighbours[source] if colour[v] == EMPTY]
+                site = free[int(rng.random() * len(free))]
+                new_colour = colour[source]
+
+            colour[site] = new_colour
+            last = empties.pop()
+            if last != site:
+                empties[position[site]] = last
+                position[last] = position[site]
+            if degrees[site]:
+                tree.update(site, empty_neighbours[site] / degrees[site])
+            for v in neighbours[site]:
+                empty_neighbours[v] -= 1
+                if colour[v] != EMPTY:
+                    tree.update(v, empty_neighbours[v] / degrees[v])
+
+        counts = np.bincount(colour)
+        return float(np.sum((counts / n) ** 2)), colours
+
+
+def merge_moments(a, b):
+    """
+    Combine two (count, mean, m2) summaries, m2 being the sum of squared
+    deviations from the mean, with the pairwise update of Chan et al.; exact
+    up to round-off and stable for any split of the samples.
+    """
+    count_a, mean_a, m2_a = a
+    count_b, mean_b, m2_b = b
+    count = count_a + count_b
+    if count == 0:
+        return a
+    delta = mean_b - mean_a
+    mean = mean_a + delta * count_b / count
+    m2 = m2_a + m2_b + delta ** 2 * count_a * count_b / count
+    return count, mean, m2
+
+
+def _moments(values):
+    mean = values.mean(axis=0)
+    return len(values), mean, ((values - mean) ** 2).sum(axis=0)
+
+
+def rate_sweep_moments(graph, mutrates, replicates, rng=None, batch=1024, method="batch"):
+    """
+    Run replicates soft sweeps of spatialsoft2d on graph at every rate in
+    mutrates and return one (count, mean, m2) per rate of the per-sweep
+    values (1 - sum of squared clone frequencies, number of colours seeded),
+    for merge_moments.
+
+    method="batch" runs batch sweeps at a time in one SoftSweepBatch shared
+    by all rates: a slot whose sweep has finished starts the next pending
+    replicate, whatever its rate, so the batch stays full across rates and
+    the graph arrays are built once. method="kmc" runs the sweeps one by one
+    in a single RejectionFreeSweep, which pays off on sparse graphs where
+    most jumps land on occupied sites.
+    """
+    mutrates = np.atleast_1d(np.asarray(mutrates, dtype=float))
+    if np.any(mutrates <= 0):
+        raise ValueError("mutrate must be positive, otherwise the sweep never starts")
+    if graph.n == 0:
+        raise ValueError("Cannot run a sweep on an empty graph")
+    rng = np.random.default_rng(rng)
+    moments = [(0, np.zeros(2), np.zeros(2)) for _ in mutrates]
+    if replicates <= 0:
+        return moments
+    if method == "kmc":
+        sim = RejectionFreeSweep(graph, mutrates[0], rng)
+        for k, mutrate in enumerate(mutrates):
+            sim.mutrate = mutrate
+            values = np.array([sim.run() for _ in range(replicates)], dtype=float)
+            values[:, 0] = 1 - values[:, 0]
+            moments[k] = _moments(values)
+        return moments
+    if method != "batch":
+        raise ValueError(f"Unknown method {method!r}, expected 'batch' or 'kmc'")
+
+    # rate index of every replicate, handed out to slots in order
+    pending = np.repeat(np.arange(len(mutrates)), replicates)
+    slots = min(batch, len(pending))
+    rate = pending[:slots].copy()
+    sim = SoftSweepBatch(graph, slots, mutrates[rate], rng)
+    rows = np.arange(slots)
+    started = slots
+    while len(rows):
+        sim.step(rows)
+        done = sim.size[rows] == sim.n
+        if not done.any():
+            continue
+        ended = rows[done]
+        values = np.column_stack([1 - sim.match_probability(ended), sim.colours[ended]])
+        for k in np.unique(rate[ended]):
+            moments[k] = merge_moments(moments[k], _moments(values[rate[ended] == k]))
+
+        restart = ended[:len(pending) - started]
+        sim.reset(restart)
+        rate[restart] = pending[started:started + len(restart)]
+        sim.mutrate[restart] = mutrates[rate[restart]]
+        started += len(restart)
+        rows = np.concatenate([rows[~done], restart])
+    return moments
+
+
+def sweep_moments(graph, replicates, mutrate, rng=None, batch=1024, method="batch"):
+    """rate_sweep_moments at the single rate mutrate."""
+    return rate_sweep_moments(graph, [mutrate], replicates, rng, batch, method)[0]
+
+
+def summarize_moments(moments):
+    """
+    {"avg_softsweep_prob", "softsweep_prob_se", "avg_num_clones",
+    "num_clones_se", "replicates"} from (count, mean, m2).
+    """
+    count, mean, m2 = moments
+    se = np.sqrt(m2 / max(count - 1, 1) / max(count, 1))
+    return {
+        "avg_softsweep_prob": float(mean[0]),
+        "softsweep_prob_se": float(se[0]),
+        "avg_num_clones": float(mean[1]),
+        "num_clones_se": float(se[1]),
+        "replicates": int(count),
+    }
+
+
+def soft_sweeps(graph, replicates, mutrate, rng=None, batch=1024, method="batch"):
+    """
+    Means over replicates soft sweeps of 1 - sum of squared clone
+    frequencies and of the number of colours seeded, with their standard
+    errors (see sweep_moments and summarize_moments).
+    """
+    return summarize_moments(sweep_moments(graph, replicates, mutrate, rng, batch, method))
+
+
+def _run_shard(graph_file, replicates, mutrates, seed, method):
+    graph = read_edge_list(graph_file)
+    return rate_sweep_moments(graph, mutrates, replicates, np.random.default_rng(seed), method=method)
+
+
+def sharded_moments(graph_file, replicates, mutrates, shards=None, max_workers=None, seed=None, method="batch"):
+    """
+    rate_sweep_moments on the graph in graph_file with the replicates split
+    into shards run on a process pool. Every shard gets its own generator
+    spawned from one root SeedSequence, so the result depends on seed and
+    shards but not on scheduling, and the shard summaries are combined with
+    merge_moments in shard order, so neither does the round-off. shards
+    defaults to the number of workers.
+    """
+    if replicates <= 0:
+        raise ValueError("replicates must be positive")
+    max_workers = max_workers or os.cpu_count() or 1
+    shards = min(shards or max_workers, replicates)
+    sizes = [replicates // shards + (i < replicates % shards) for i in range(shards)]
+    seeds = np.random.SeedSequence(seed).spawn(shards)
+
+    moments = [(0, np.zeros(2), np.zeros(2)) for _ in np.atleast_1d(mutrates)]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(_run_shard, graph_file, size, mutrates, shard_seed, method)
+            for size, shard_seed in zip(sizes, seeds)
+        ]
+        for future in futures:
+            moments = [merge_moments(a, b) for a, b in zip(moments, future.result())]
+    return moments
+
+
+def sharded_soft_sweeps(graph_file, replicates, mutrate, shards=None, max_workers=None, seed=None, method="batch"):
+    """soft_sweeps with the replicates sharded over a process pool (see sharded_moments)."""
+    return summarize_moments(sharded_moments(graph_file, replicates, [mutrate], shards, max_workers, seed, method)[0])
+
+
+def save_summary(filename, result):
+    """Write result in the format of the spatialsoft2d summary file, plus standard errors."""
+    with open(filename, "w") as f:
+        f.write(f"average probability of softsweep: {result['avg_softsweep_prob']:.11g}\n")
+        f.write(f"average num clones:  {result['avg_num_clones']:.11g}\n")
+        f.write(f"standard error probability of softsweep: {result['softsweep_prob_se']:.11g}\n")
+        f.write(f"standard error num clones: {result['num_clones_se']:.11g}\n")
+
+
+def main(graph_type, name, mutrate, replicates=100000, seed=None, max_workers=1, method="batch"):
+    """
+    Same inputs and summary file as spatialsoft2d --graph graph_type --file
+    name --mutrate mutrate: reads graph_type/name.txt once and writes
+    graph_type_output/name_<mutrate>.txt. max_workers other than 1 shards
+    the replicates over that many processes (None for every core).
+    """
+    return mutrate_sweep(graph_type, name, [mutrate], replicates, seed, max_workers, method).iloc[0].to_dict()
+
+
+def mutrate_sweep(graph_type, name, mutrates, replicates=100000, seed=None, max_workers=1, method="batch"):
+    """
+    main at every rate in mutrates in one run on the graph read once: writes
+    the summary file of each rate and returns the table of all rates, one
+    row per rate, also saved as graph_type_output/name_sweep.csv when there
+    is more than one rate.
+    """
+    if replicates <= 0:
+        raise ValueError("replicates must be positive, otherwise the summary would be empty")
+    graph_file = Path(graph_type) / f"{name}.txt"
+    if max_workers == 1:
+        moments = rate_sweep_moments(read_edge_list(graph_file), mutrates, replicates, rng=seed, method=method)
+    else:
+        moments = sharded_moments(graph_file, replicates, mutrates, max_workers=max_workers, seed=seed, method=method)
+    out_dir = Path(f"{graph_type}_output")
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    rows = []
+    for mutrate, rate_moments in zip(mutrates, moments):
+        result = summarize_moments(rate_moments)
+        save_summary(out_dir / f"{name}_{mutrate:.6f}.txt", result)
+        rows.append({"graph_name": name, "graph_type": graph_type, "mutrate": mutrate, **result})
+    table = pd.DataFrame(rows)
+    if len(mutrates) > 1:
+        table.to_csv(out_dir / f"{name}_sweep.csv", index=False)
+    return table
+
+
+if __name__ == "__main__":
+    # python softsweep.py graph_type name mutrate[,mutrate...] [replicates] [seed]
+    #     [--workers=K, 0 for every core] [--kmc]
+    options = dict(a[2:].partition("=")[::2] for a in sys.argv[1:] if a.startswith("--"))
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if len(args) < 3:
+        print("Not enough arguments!")
+        sys.exit(1)
+    table = mutrate_sweep(
+        args[0], args[1], [float(mu) for mu in args[2].split(",")],
+        int(args[3]) if len(args) > 3 else 100000,
+        int(args[4]) if len(args) > 4 else None,
+        max_workers=int(options.get("workers", 1)) or None,
+        method="kmc" if "kmc" in options else "batch"
+    )
+    print(table.to_string(index=False))
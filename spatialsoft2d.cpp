@@ -4,6 +4,7 @@
 #include <iomanip>
 #include <map>
 #include "lrd2d.h"
+#include "weights.h"
 
 #include <fstream>
 #include <vector>
@@ -15,42 +16,7 @@
 
 using namespace popl;
 
-// weights are over flat sites [0, L^d)
-using weightMap = std::map<double, int>;  // key: cumulative length, value: quantizedPoint (int)
-
-double P_BARE = 1;
 int lastcolor = 0;
-weightMap weights;
-
-double lastweightKey = 0.0;
-
-void addToEnd(int pt, double length) {
-    if (weights.empty()) {
-        weights[length] = pt;
-        lastweightKey = length;
-        return;
-    }
-    auto it = weights.end();
-    --it;
-    double newKey = it->first + length;
-    weights[newKey] = pt;
-    lastweightKey = newKey;
-}
-
-
-void print_weights() {
-    for (auto it = weights.begin(); it != weights.end(); ++it) {
-        std::cout << it->first << ' ' << it->second << '\n';
-    }
-}
-
-void initialize_weights(latticeLongRangeSim &sim, double weight) {
-    // Give every site an initial weight segment of length `weight`
-    const long long total = sizeof(sim.network);
-    for (long long i = 0; i < total; ++i) {
-        addToEnd(static_cast<int>(i), weight);
-    }
-}
 
 // Reset access counts for all nodes in the current network
 void initialize_counts(latticeLongRangeSim &sim) {
@@ -116,40 +82,6 @@ qpDict initialize_network(std::string out_file, std::string name) {
     return adjList;
 }
 
-weightMap::iterator randomFromWeights(latticeLongRangeSim &sim) {
-    // pick uniformly in [0, lastweightKey)
-    double randomKey = sim.rand01(sim.rng) * lastweightKey;
-    return weights.upper_bound(randomKey);
-}
-
-// Find the iterator corresponding to a given flat site `pt` when every site’s
-// segment length is `weight`. The segment center is at (pt + 0.5) * weight.
-weightMap::iterator weight_position(int pt, double weight) {
-    const double center = (static_cast<double>(pt) + 0.5) * weight;
-    return weights.lower_bound(center);
-}
-
-// Mark a weighted entry as “claimed” (store negative index) and add a new segment
-void addNewMutation(latticeLongRangeSim &sim, weightMap::iterator basept, int color, double mutrate) {
-    sim.addPoint(basept->second, color);                 // occupy site with new color
-    basept->second = -static_cast<int>(sim.sites.size()); // mark as linked to current index
-    addToEnd(basept->second, P_BARE - mutrate);          // append new weight segment
-}
-
-bool tryCopyMutation(latticeLongRangeSim &sim, int newpt, int color, double mutrate) {
-    if (sim.addPoint(newpt, color)) {
-        int newidx = static_cast<int>(sim.sites.size());
-        auto it = weight_position(newpt, mutrate);
-        if (it != weights.end()) {
-            it->second = -newidx;    // mark source weight slot
-        }
-        int marker = -newidx;
-        addToEnd(marker, P_BARE - mutrate);
-        return true;
-    }
-    return false;
-}
-
 // Populate a disk of radius diameter/2 around the center for d == 2,
 // using flat indices. (For other d, adjust as needed.)
 
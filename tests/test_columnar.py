@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from columnar import ColumnStore
+
+
+def test_extend_read_and_reopen(tmp_path):
+    store = ColumnStore(tmp_path / "t")
+    store.extend({"graph": ["a", "b", "a"], "n": [1, 2, 3], "p": [0.5, 0.25, 0.125]})
+    store.append({"graph": "c", "n": 4, "p": 1.0})
+    assert len(store) == 4
+
+    df = ColumnStore(tmp_path / "t").read()
+    assert df["graph"].tolist() == ["a", "b", "a", "c"]
+    assert df["n"].tolist() == [1, 2, 3, 4]
+    assert df["n"].dtype == np.int64
+    assert np.allclose(df["p"], [0.5, 0.25, 0.125, 1.0])
+
+
+def test_where_filters(tmp_path):
+    store = ColumnStore(tmp_path / "t")
+    store.extend({"graph": ["a", "b", "a", "c"], "mu": [1, 2, 1, 3], "n": [10, 20, 30, 40]})
+
+    assert store.read(["n"], where={"graph": "a"})["n"].tolist() == [10, 30]
+    assert store.read(["n"], where={"graph": ["b", "c", "zzz"]})["n"].tolist() == [20, 40]
+    assert store.read(["n"], where={"n": lambda n: n > 15, "graph": "a"})["n"].tolist() == [30]
+    assert store.read(["n"], where={"graph": "missing"}).empty
+    # mu was stored as strings; an int filter must find it the same way
+    assert store.read(["n"], where={"mu": 1})["n"].tolist() == [10, 30]
+
+
+def test_new_and_missing_columns(tmp_path):
+    store = ColumnStore(tmp_path / "t")
+    store.extend({"n": [1, 2]})
+    store.extend({"n": [3], "label": ["x"], "p": [0.5]})
+    store.append({"label": "y"})
+
+    df = store.read()
+    assert df["n"].tolist() == [1, 2, 3, -1]
+    assert df["label"].isna().tolist() == [True, True, False, False]
+    assert df["label"][2:].tolist() == ["x", "y"]
+    assert np.isnan(df["p"][[0, 1, 3]]).all() and df["p"][2] == 0.5
+
+
+def test_unequal_lengths_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ColumnStore(tmp_path / "t").extend({"a": [1, 2], "b": [1]})
+
+
+def test_partial_row_is_dropped(tmp_path):
+    store = ColumnStore(tmp_path / "t")
+    store.extend({"a": [1, 2], "b": [1.0, 2.0]})
+    # a crash after writing one column of a row
+    with open(tmp_path / "t" / "a.bin", "ab") as f:
+        np.array([99], dtype="<i8").tofile(f)
+    store = ColumnStore(tmp_path / "t")
+    assert len(store) == 2
+    store.append({"a": 3, "b": 3.0})
+    assert store.read()["a"].tolist() == [1, 2, 3]
@@ -0,0 +1,69 @@
+import networkx as nx
+import numpy as np
+
+import csr_graph
+import generate_grids
+import generate_tree
+from csr_graph import CSRGraph, read_edge_list
+
+
+def edge_set(edges):
+    return {tuple(sorted(map(int, e))) for e in edges}
+
+
+def test_from_edges_merges_duplicates_and_matches_networkx():
+    G = nx.gnm_random_graph(40, 120, seed=1)
+    edges = list(G.edges()) + [(v, u) for u, v in list(G.edges())[:10]]
+    graph = CSRGraph.from_edges(edges, G.number_of_nodes())
+    assert edge_set(graph.edges()) == edge_set(G.edges())
+    assert graph.number_of_edges() == G.number_of_edges()
+    assert graph.degrees().tolist() == [d for _, d in sorted(G.degree())]
+
+
+def test_grid_matches_original_builder_and_networkx():
+    for height, width in [(1, 7), (4, 5), (10, 100)]:
+        graph = csr_graph.grid(height, width)
+        assert edge_set(graph.edges()) == edge_set(generate_grids.generate_grid(height, width))
+        G = nx.convert_node_labels_to_integers(nx.grid_2d_graph(height, width), ordering="sorted")
+        assert edge_set(graph.edges()) == edge_set(G.edges())
+
+
+def test_tree_matches_original_builder():
+    for num_levels in range(1, 5):
+        graph = csr_graph.tree(num_levels, 21, 17)
+        assert edge_set(graph.edges()) == edge_set(generate_tree.generate_tree(num_levels, 21, 17))
+
+
+def test_fingers_and_line_edge_sets():
+    rows, cols, k = 6, 5, 2
+    G = nx.convert_node_labels_to_integers(nx.grid_2d_graph(rows, cols), ordering="sorted")
+    G.remove_edges_from([(u, u + 1) for u in range(k * cols, rows * cols) if u % cols < cols - 1])
+    assert edge_set(csr_graph.fingers(rows, cols, k).edges()) == edge_set(G.edges())
+
+    n, step = 20, 3
+    G = nx.path_graph(n)
+    G.add_edges_from((n // 2 - 1 - t, n // 2 + t) for t in range(step + 1))
+    assert edge_set(csr_graph.line(n, step).edges()) == edge_set(G.edges())
+
+
+def test_bottleneck_edge_set():
+    cluster = [(0, 1), (1, 2), (2, 0)]
+    graph = csr_graph.bottleneck(cluster, cluster, 3, 2)
+    assert edge_set(graph.edges()) == edge_set(cluster + [(3, 4), (4, 5), (5, 3), (0, 3), (1, 4)])
+
+
+def test_read_edge_list_compacts_ids_like_networkx(tmp_path):
+    path = tmp_path / "gaps.txt"
+    path.write_text("3 7\n7 10\n10 3\n10 42\n")
+    graph = read_edge_list(path)
+    G = nx.convert_node_labels_to_integers(nx.read_edgelist(path, nodetype=int), ordering="sorted")
+    assert graph.n == G.number_of_nodes() == 4
+    assert edge_set(graph.edges()) == edge_set(G.edges())
+
+
+def test_save_and_read_round_trip(tmp_path):
+    graph = csr_graph.grid(3, 4)
+    graph.save_edge_list(tmp_path / "grid.txt")
+    again = read_edge_list(tmp_path / "grid.txt")
+    assert np.array_equal(again.indptr, graph.indptr)
+    assert np.array_equal(again.indices, graph.indices)
@@ -0,0 +1,80 @@
+import shutil
+
+import numpy as np
+import pytest
+
+import fenwick
+from fenwick import FenwickTree
+
+
+def owner(weights, values):
+    # index whose cumulative interval [prefix(i), prefix(i + 1)) holds each value
+    return np.searchsorted(np.cumsum(weights), values, side="right")
+
+
+def test_prefix_and_find_match_cumsum():
+    rng = np.random.default_rng(0)
+    for n in (1, 2, 7, 64, 1000):
+        weights = rng.random(n) * (rng.random(n) < 0.7)
+        if weights.sum() == 0:
+            weights[0] = 1.0
+        tree = FenwickTree(weights)
+        assert tree.total() == pytest.approx(weights.sum())
+        i = np.arange(n + 1)
+        assert np.allclose(tree.prefix(i), np.concatenate([[0], np.cumsum(weights)]))
+
+        values = rng.random(200) * weights.sum()
+        found = tree.find(values)
+        assert np.array_equal(found, owner(weights, values))
+        assert [tree.find_one(v) for v in values] == found.tolist()
+        assert np.all(weights[found] > 0)
+
+
+def test_updates_keep_tree_consistent():
+    rng = np.random.default_rng(1)
+    weights = rng.random(50)
+    tree = FenwickTree(weights)
+    for _ in range(200):
+        i = int(rng.integers(50))
+        weights[i] = rng.random() if rng.random() < 0.8 else 0.0
+        tree.update(i, weights[i])
+    idx = rng.choice(50, 10, replace=False)
+    weights[idx] = rng.random(10)
+    tree.set(idx, weights[idx])
+    tree.add([3, 3], 0.5)
+    weights[3] += 1.0
+
+    assert np.allclose(tree.weights, weights)
+    assert tree.total() == pytest.approx(weights.sum())
+    assert np.allclose(tree.prefix(np.arange(51)), np.concatenate([[0], np.cumsum(weights)]))
+    # the tree must equal one built from scratch
+    assert np.allclose(tree.tree, FenwickTree(weights).tree)
+
+
+def test_sample_frequencies_and_zero_weights():
+    rng = np.random.default_rng(2)
+    weights = np.array([1.0, 0.0, 3.0, 0.0, 4.0])
+    draws = FenwickTree(weights).sample(40000, rng)
+    assert not np.isin(draws, [1, 3]).any()
+    freq = np.bincount(draws, minlength=5) / len(draws)
+    p = weights / weights.sum()
+    assert np.all(np.abs(freq - p) <= 4 * np.sqrt(p * (1 - p) / len(draws)) + 1e-12)
+
+    distinct = FenwickTree(weights).sample_distinct(3, rng)
+    assert sorted(distinct.tolist()) == [0, 2, 4]
+
+
+def test_clear_and_empty_tree():
+    tree = FenwickTree(np.ones(8))
+    tree.clear()
+    assert tree.total() == 0
+    with pytest.raises(ValueError):
+        tree.sample(1, np.random.default_rng(0))
+    assert len(FenwickTree(5)) == 5 and FenwickTree(5).total() == 0
+
+
+@pytest.mark.skipif(shutil.which("g++") is None, reason="no C++ compiler")
+def test_benchmark_builds_and_runs(capsys):
+    tree_ns, map_ns = fenwick.benchmark(n=200, events=2000)
+    assert tree_ns > 0 and map_ns > 0
+    assert "2201 entries" in capsys.readouterr().out
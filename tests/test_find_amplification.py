@@ -0,0 +1,35 @@
+import numpy as np
+
+from find_amplification import _log_fixation, solve_alpha
+
+
+def fixation(alpha, s, N):
+    r = (1 + s) ** -alpha
+    return (1 - r) / (1 - r ** N)
+
+
+def test_solve_alpha_inverts_fixation_formula():
+    for s, N in [(0.001, 1000), (0.1, 50), (0.5, 8)]:
+        alpha = np.array([-3.0, -0.5, 0.1, 0.7, 1.0, 2.5, 10.0])
+        probability = fixation(alpha, s, N)
+        assert np.allclose(solve_alpha(probability, s=s, N=N), alpha, rtol=1e-8)
+        assert np.isclose(solve_alpha(float(probability[4]), s=s, N=N), 1.0)
+
+
+def test_solve_alpha_neutral_and_extremes():
+    assert abs(solve_alpha(1 / 1000, s=0.001, N=1000)) < 1e-8
+    assert solve_alpha(0.0, s=0.01, N=100) == -np.inf
+    assert solve_alpha(1.0, s=0.01, N=100) == np.inf
+    # probabilities near 1e-200 and 1 - 1e-5, far from the starting guess
+    alpha = np.array([-0.23, 30.0])
+    probability = np.exp(_log_fixation(alpha * np.log1p(0.5), 5000))
+    assert 0 < probability[0] < 1e-190 and probability[1] < 1
+    assert np.allclose(solve_alpha(probability, s=0.5, N=5000), alpha, rtol=1e-8)
+
+
+def test_solve_alpha_broadcasts():
+    s = np.array([0.01, 0.1, 0.2])
+    N = np.array([[10], [1000]])
+    probability = fixation(1.5, s, N)
+    assert solve_alpha(probability, s=s, N=N).shape == (2, 3)
+    assert np.allclose(solve_alpha(probability, s=s, N=N), 1.5)
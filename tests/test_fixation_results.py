@@ -0,0 +1,37 @@
+import numpy as np
+
+import fixation_results
+from find_amplification import amplification
+
+
+def write_rows(path, rows):
+    np.savetxt(path, np.array(rows, dtype=float), delimiter="\t")
+
+
+def test_text_and_table_amplification_agree(tmp_path):
+    # Evograph layout: Bd rows, then dB rows with a very different fixation
+    # probability that must not enter the amplification
+    (tmp_path / "text" / "grids").mkdir(parents=True)
+    path = tmp_path / "text" / "grids" / "3_grid_5.txt"
+    write_rows(path, [
+        [0.001, 99800, 200, 1.0, 2.0, 0.1],
+        [0.001, 49800, 150, 1.0, 2.0, 0.1],
+        [0.001, 90000, 10000, 1.0, 2.0, 0.1],
+        [0.001, 45000, 5000, 1.0, 2.0, 0.1],
+    ])
+    store = tmp_path / "store"
+    fixation_results.import_text(tmp_path / "text", store)
+    table = fixation_results.amplification_table(store)
+
+    assert fixation_results.read_results(store)["dynamics"].tolist() == ["Bd", "Bd", "dB", "dB"]
+    assert len(table) == 1
+    assert np.isclose(table["amp"][0], amplification(path))
+
+
+def test_odd_files_are_skipped(tmp_path):
+    (tmp_path / "text" / "grids").mkdir(parents=True)
+    path = tmp_path / "text" / "grids" / "grid_5.txt"
+    write_rows(path, [[0.001, 99800, 200, 1.0, 2.0, 0.1]] * 3)
+    store = fixation_results.import_text(tmp_path / "text", tmp_path / "store")
+    assert len(store) == 0
+    assert np.isnan(amplification(path))
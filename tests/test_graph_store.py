@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+import csr_graph
+from graph_store import GraphStore
+
+
+def same(a, b):
+    return np.array_equal(a.indptr, b.indptr) and np.array_equal(a.indices, b.indices)
+
+
+def test_add_replace_and_compact(tmp_path):
+    store = GraphStore(tmp_path / "s")
+    graphs = {f"g{k}": csr_graph.grid(k + 1, 3) for k in range(4)}
+    for name, graph in graphs.items():
+        store.add(name, graph)
+    # replacing every graph twice leaves more dead space than live
+    for _ in range(2):
+        for name in graphs:
+            graphs[name] = csr_graph.line(3 * int(name[1:]) + 4, 0)
+            store.add(name, graphs[name])
+
+    reopened = GraphStore(tmp_path / "s")
+    assert sorted(reopened.names()) == sorted(graphs)
+    assert all(same(reopened.get(name), graph) for name, graph in graphs.items())
+    live = sum(g.n + 1 for g in graphs.values())
+    assert reopened._indptr_end <= 2 * live
+    # only the arrays the index names are left
+    assert sorted(f.name for f in (tmp_path / "s").glob("*.bin")) == sorted(reopened._arrays)
+
+
+def test_crash_during_compaction_keeps_old_store(tmp_path, monkeypatch):
+    store = GraphStore(tmp_path / "s")
+    graphs = {f"g{k}": csr_graph.grid(2, k + 2) for k in range(3)}
+    for name, graph in graphs.items():
+        store.add(name, graph)
+        store.add(name, graph)
+
+    def crash():
+        raise KeyboardInterrupt
+    monkeypatch.setattr(store, "_write_index_file", crash)
+    with pytest.raises(KeyboardInterrupt):
+        store.compact()
+
+    reopened = GraphStore(tmp_path / "s")
+    assert all(same(reopened.get(name), graph) for name, graph in graphs.items())
+    # the next compaction clears the abandoned arrays
+    reopened.compact()
+    assert len(list((tmp_path / "s").glob("*.bin"))) == 2
+    assert all(same(GraphStore(tmp_path / "s").get(name), graph) for name, graph in graphs.items())
@@ -0,0 +1,76 @@
+import shutil
+
+import networkx as nx
+import numpy as np
+import pytest
+
+import moran
+from csr_graph import CSRGraph
+
+N = 8
+S = 0.5
+
+
+@pytest.fixture(scope="module")
+def kernel():
+    if shutil.which("g++") is None:
+        pytest.skip("no C++ compiler to build moran_kernel.so")
+    assert moran.build_kernel()
+
+
+def use(method, request):
+    if method == "compiled":
+        request.getfixturevalue("kernel")
+    return method
+
+
+def exact_fixation(mode, N=N, s=S):
+    # birth-death chain on the complete graph with i mutants
+    r = 1 + s
+    i = np.arange(1, N)
+    if mode == "Bd":
+        return (1 - 1 / r) / (1 - r ** -N)
+    up = (N - i) / N * i * r / (i * r + N - 1 - i)
+    down = i / N * (N - i) / ((i - 1) * r + N - i)
+    return 1 / (1 + np.cumprod(down / up).sum())
+
+
+@pytest.mark.parametrize("mode", ["Bd", "dB"])
+@pytest.mark.parametrize("method,trials", [("compiled", 20000), ("batch", 20000), ("kmc", 2000)])
+def test_fixation_matches_complete_graph(mode, method, trials, request):
+    graph = CSRGraph.from_networkx(nx.complete_graph(N))
+    counts, times = moran.fixation(graph, trials, S, mode, rng=1, method=use(method, request))
+    assert counts.sum() == trials
+    p = exact_fixation(mode)
+    assert abs(counts[1] / trials - p) <= 4 * np.sqrt(p * (1 - p) / trials)
+    assert np.all(times >= counts)
+
+
+@pytest.mark.parametrize("mode", ["Bd", "dB"])
+@pytest.mark.parametrize("method,trials", [("compiled", 6000), ("kmc", 2000)])
+def test_engines_agree_with_batch_on_a_grid(mode, method, trials, request):
+    # fixation probability of each engine against the batch engine on a
+    # graph with no closed form
+    graph = CSRGraph.from_networkx(nx.convert_node_labels_to_integers(nx.grid_2d_graph(3, 4)))
+    estimates = []
+    for method, trials in (("batch", 6000), (use(method, request), trials)):
+        counts, times = moran.fixation(graph, trials, S, mode, rng=2, method=method)
+        p = counts[1] / trials
+        estimates.append((p, p * (1 - p) / trials))
+    (p1, v1), (p2, v2) = estimates
+    assert abs(p1 - p2) <= 4 * np.sqrt(v1 + v2)
+
+
+@pytest.mark.parametrize("method", ["compiled", "batch", "kmc"])
+def test_disconnected_graph_raises(method, request):
+    graph = CSRGraph.from_edges([(0, 1), (1, 2), (3, 4)], 5)
+    with pytest.raises(ValueError):
+        moran.fixation(graph, 200, S, rng=0, method=use(method, request))
+
+
+def test_unknown_mode_and_method():
+    graph = CSRGraph.from_networkx(nx.complete_graph(4))
+    with pytest.raises(ValueError):
+        moran.fixation(graph, 10, S, mode="BD")
+    with pytest.raises(ValueError):
+        moran.fixation(graph, 10, S, method="exact")
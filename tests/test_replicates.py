@@ -0,0 +1,33 @@
+import json
+
+import replicates
+
+PARAMS = dict(num_generation=3, dim=3, deme_pop=10, s=0.1, r=0.5, migration_prob=0.1, mutant_prob=0.01)
+
+
+def rows(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_resume_reruns_record_without_newline(tmp_path):
+    out = tmp_path / "runs.jsonl"
+    replicates.run_replicates([PARAMS], 2, out, simulation="linear", seed=1, max_workers=1)
+    first = rows(out)
+    # a crash right before the newline of the last record
+    out.write_text(out.read_text()[:-1])
+    replicates.run_replicates([PARAMS], 2, out, simulation="linear", seed=1, max_workers=1)
+    again = rows(out)
+    assert len(again) == 2
+    assert sorted(r["replicate"] for r in again) == [0, 1]
+    assert {r["replicate"]: r["clones"] for r in again} == {r["replicate"]: r["clones"] for r in first}
+
+
+def test_failed_job_keeps_others_and_retries(tmp_path):
+    out = tmp_path / "runs.jsonl"
+    bad = dict(PARAMS, deme_pop=-1)
+    replicates.run_replicates([PARAMS, bad], 2, out, simulation="linear", seed=1, max_workers=1)
+    assert [r["params"] for r in rows(out)] == [PARAMS, PARAMS]
+
+    replicates.run_replicates([PARAMS, bad], 2, out, simulation="linear", seed=1, max_workers=1)
+    # the finished jobs are not rerun, the failed ones are tried again
+    assert len(rows(out)) == 2
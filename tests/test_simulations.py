@@ -0,0 +1,138 @@
+import json
+
+import numpy as np
+import pytest
+
+import grid_simulation as gs
+import linear_simulation as ls
+from checkpoint import load_checkpoint, save_checkpoint, truncate_partial_line
+from observables import variant_observables
+
+DIM = 4
+DEME_POP = 20
+PARAMS = dict(deme_pop=DEME_POP, s=0.2, r=0.5, migration_prob=0.1, mutant_prob=0.005)
+
+
+def fresh_grid(dim=DIM):
+    return [[{0: DEME_POP} for _ in range(dim)] for _ in range(dim)]
+
+
+def totals(demes):
+    counts = {}
+    for deme in demes:
+        for variant, pop in deme.items():
+            counts[variant] = counts.get(variant, 0) + pop
+    return variant_observables(list(counts.values()), list(counts))
+
+
+def test_grid_engines_agree():
+    # in-place vs simultaneous migration differ only at second order in
+    # migration_prob; over a few hundred runs that is well inside the noise
+    replicates = 300
+    results = {}
+    for name, engine in (("dict", gs.grid_simulation), ("vectorized", gs.grid_simulation_vectorized)):
+        rng = np.random.default_rng(5)
+        stats = []
+        for _ in range(replicates):
+            grid, _ = engine(fresh_grid(), 1, 15, DIM, rng=rng, **PARAMS)
+            observed = totals(deme for row in grid for deme in row)
+            stats.append((observed["mutant_fraction"], observed["clones"]))
+        stats = np.array(stats)
+        results[name] = (stats.mean(axis=0), stats.std(axis=0, ddof=1) / np.sqrt(replicates))
+    (mean_a, se_a), (mean_b, se_b) = results.values()
+    assert np.all(np.abs(mean_a - mean_b) <= 4 * np.hypot(se_a, se_b))
+
+
+def test_grid_dict_migration_stays_on_lattice():
+    # a single column of mutants on the left edge can only spread rightwards
+    grid = [[{0: DEME_POP} for _ in range(DIM)] for _ in range(DIM)]
+    for row in grid:
+        row[0] = {1: DEME_POP}
+    params = dict(PARAMS, s=0.0, mutant_prob=0.0, migration_prob=0.5)
+    grid, new_idx = gs.grid_simulation(grid, 2, 1, DIM, rng=0, **params)
+    assert new_idx == 2
+    assert all(row[-1].get(1, 0) == 0 for row in grid)
+    assert all(sum(deme.values()) >= DEME_POP for row in grid for deme in row)
+
+
+def test_resample_keeps_counts_within_demes():
+    rng = np.random.default_rng(0)
+    pop = rng.integers(0, 15, (200, 6))
+    pop[:5] = 0
+    out = ls.resample(pop, DEME_POP, rng)
+    total = pop.sum(axis=1)
+    assert np.all(out.sum(axis=1) == np.where(total > 0, DEME_POP, 0))
+    thinned = total >= DEME_POP
+    assert np.all(out[thinned] <= pop[thinned])
+    assert np.all(out[pop == 0] == 0)
+
+
+def test_linear_demes_are_resampled_exactly():
+    # unlike the ceil of linear_simulation, so the dict and vectorized
+    # linear engines are not expected to agree in distribution
+    dim = 10
+    vector, _ = ls.linear_simulation_vectorized([{0: DEME_POP} for _ in range(dim)], 1, 40, dim, rng=3, **PARAMS)
+    assert all(sum(deme.values()) == DEME_POP for deme in vector)
+
+
+def test_truncate_partial_line(tmp_path):
+    path = tmp_path / "log.jsonl"
+    truncate_partial_line(path)
+    assert not path.exists()
+    path.write_text('{"a": 1}\n{"a": 2}\n{"a"')
+    truncate_partial_line(path)
+    assert [json.loads(line) for line in path.read_text().splitlines()] == [{"a": 1}, {"a": 2}]
+    path.write_text("no newline at all")
+    truncate_partial_line(path)
+    assert path.read_text() == ""
+
+
+@pytest.mark.parametrize("gc_every", [1, 4])
+def test_grid_resume_is_bit_identical(tmp_path, gc_every):
+    checkpoint = tmp_path / "grid.npz"
+    full, full_idx = gs.grid_simulation_vectorized(fresh_grid(5), 1, 30, 5, rng=7, gc_every=gc_every, **PARAMS)
+    gs.grid_simulation_vectorized(fresh_grid(5), 1, 12, 5, rng=7, gc_every=gc_every,
+                                  checkpoint_file=checkpoint, checkpoint_every=0, **PARAMS)
+    resumed, resumed_idx = gs.resume_grid_simulation(checkpoint, num_generation=30)
+    assert resumed_idx == full_idx
+    assert [list(row) for row in resumed] == [list(row) for row in full]
+
+
+def test_linear_resume_is_bit_identical(tmp_path):
+    checkpoint = tmp_path / "line.npz"
+    dim = 10
+    full, full_idx = ls.linear_simulation_vectorized([{0: DEME_POP} for _ in range(dim)], 1, 40, dim, rng=3, **PARAMS)
+    ls.linear_simulation_vectorized([{0: DEME_POP} for _ in range(dim)], 1, 25, dim, rng=3,
+                                    checkpoint_file=checkpoint, checkpoint_every=0, **PARAMS)
+    resumed, resumed_idx = ls.resume_linear_simulation(checkpoint, num_generation=40)
+    assert resumed_idx == full_idx
+    assert list(resumed) == list(full)
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = tmp_path / "state.npz"
+    rng = np.random.default_rng(9)
+    rng.random(3)
+    state = {"gen": np.int64(4), "s": np.float64(0.1), "shape": np.arange(3)}
+    save_checkpoint(path, {"pop": np.ones((2, 3), dtype=np.int64)}, state, rng)
+    arrays, loaded, restored = load_checkpoint(path)
+    assert loaded == {"gen": 4, "s": 0.1, "shape": [0, 1, 2]}
+    assert np.array_equal(arrays["pop"], np.ones((2, 3)))
+    assert np.array_equal(restored.random(5), rng.random(5))
+
+
+def test_reclaimed_count_is_reported(tmp_path):
+    checkpoint = tmp_path / "grid.npz"
+    params = dict(PARAMS, mutant_prob=0.05)
+    observed = []
+    grid, new_idx = gs.grid_simulation_vectorized(fresh_grid(), 1, 20, DIM, rng=2, checkpoint_file=checkpoint,
+                                                  checkpoint_every=3600, observe=observed.append, **params)
+    reclaimed = [stats["reclaimed"] for stats in observed]
+    assert reclaimed == sorted(reclaimed) and reclaimed[-1] > 0
+    # with gc_every=1 only live variants are held, and every id handed out
+    # is either held or reclaimed
+    live = {variant for row in grid for deme in row for variant in deme}
+    assert observed[-1]["variants"] == len(live)
+    assert observed[-1]["variants"] + reclaimed[-1] == new_idx
+    _, state, _ = load_checkpoint(checkpoint)
+    assert state["gen"] == 20 and state["reclaimed"] == reclaimed[-1]
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import csr_graph
+import softsweep
+from csr_graph import CSRGraph
+from softsweep import merge_moments, _moments
+
+
+@pytest.mark.parametrize("method", ["batch", "kmc"])
+def test_two_sites_exact(method):
+    # the first site is seeded; the second gets a colour of its own with
+    # probability mutrate and is otherwise filled from the first
+    mutrate = 0.3
+    graph = CSRGraph.from_edges([(0, 1)], 2)
+    result = softsweep.summarize_moments(softsweep.sweep_moments(graph, 20000, mutrate, rng=1, method=method))
+    assert result["replicates"] == 20000
+    assert abs(result["avg_num_clones"] - (1 + mutrate)) <= 4 * result["num_clones_se"]
+    assert abs(result["avg_softsweep_prob"] - mutrate / 2) <= 4 * result["softsweep_prob_se"]
+
+
+def test_batch_and_rejection_free_agree():
+    graph = csr_graph.grid(4, 4)
+    batch = softsweep.summarize_moments(softsweep.sweep_moments(graph, 3000, 0.05, rng=1))
+    kmc = softsweep.summarize_moments(softsweep.sweep_moments(graph, 1500, 0.05, rng=2, method="kmc"))
+    for key in ("softsweep_prob", "num_clones"):
+        se = np.hypot(batch[f"{key}_se"], kmc[f"{key}_se"])
+        assert abs(batch[f"avg_{key}"] - kmc[f"avg_{key}"]) <= 4 * se
+
+
+def test_merge_moments_is_exact():
+    rng = np.random.default_rng(0)
+    values = rng.random((101, 2)) * [1, 50]
+    merged = (0, np.zeros(2), np.zeros(2))
+    for part in np.array_split(values, [1, 2, 40, 90]):
+        merged = merge_moments(merged, _moments(part))
+    count, mean, m2 = merged
+    assert count == 101
+    assert np.allclose(mean, values.mean(axis=0))
+    assert np.allclose(m2, values.var(axis=0) * 101)
+
+
+def test_sharded_moments(tmp_path):
+    path = tmp_path / "grid.txt"
+    csr_graph.grid(3, 3).save_edge_list(path)
+    one = softsweep.sharded_moments(path, 50, [0.1], shards=3, max_workers=1, seed=4)
+    two = softsweep.sharded_moments(path, 50, [0.1], shards=3, max_workers=1, seed=4)
+    assert one[0][0] == 50
+    assert np.array_equal(one[0][1], two[0][1]) and np.array_equal(one[0][2], two[0][2])
+    with pytest.raises(ValueError):
+        softsweep.sharded_moments(path, 0, [0.1])
+
+
+def test_rate_sweep_matches_single_rates():
+    # sweeps of every rate share one batch; each rate must still get its
+    # own replicate count and the ordering of rates must be kept
+    graph = csr_graph.grid(3, 3)
+    low, high = softsweep.rate_sweep_moments(graph, [0.001, 1.0], 1000, rng=3)
+    assert low[0] == high[0] == 1000
+    # at a tiny rate one colour almost always takes the whole graph
+    assert low[1][1] < 1.2 < high[1][1]
@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class VariantTable(object):
+    """
+    Compact table of the live variants of a lattice simulation.
+
+    Column c of the population array holds variant ids[c]. Mutants are
+    appended at the end with fresh external ids, and compact() drops the
+    columns of extinct variants so that memory and per-generation work are
+    bounded by live diversity rather than by the number of mutations so far.
+    The ids live in a buffer whose capacity doubles, like the population
+    array, so add() is amortised O(count).
+    """
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.reclaimed = 0
+        # per-variant totals left by the last compact(), for the observables
+        self.totals = None
+        self._index = None
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def ids(self):
+        return self._ids[:self._n]
+
+    @ids.setter
+    def ids(self, ids):
+        self._ids = np.array(ids, dtype=np.int64)
+        self._n = len(self._ids)
+
+    def column(self, variant):
+        """Dense column index of an external variant id."""
+        if self._index is None:
+            self._index = {v: c for c, v in enumerate(self.ids.tolist())}
+        return self._index[variant]
+
+    def add(self, new_idx, count):
+        """Append count mutants with ids new_idx, new_idx + 1, ... and return the next free id."""
+        if self._n + count > len(self._ids):
+            grown = np.empty(max(2 * len(self._ids), self._n + count), dtype=np.int64)
+            grown[:self._n] = self.ids
+            self._ids = grown
+        self._ids[self._n:self._n + count] = np.arange(new_idx, new_idx + count)
+        self._n += count
+        self._index = None
+        return new_idx + count
+
+    def compact(self, pop):
+        """
+        Drop every variant whose count is 0 in all demes. pop has the variant
+        axis last; returns the boolean mask of surviving columns so the
+        caller can apply it to its own storage. The total count of every
+        surviving variant is kept in totals.
+        """
+        totals = pop.reshape(int(np.prod(pop.shape[:-1])), pop.shape[-1]).sum(axis=0)
+        alive = totals > 0
+        self.totals = totals[alive]
+        dead = len(alive) - int(alive.sum())
+        if dead:
+            self.ids = self.ids[alive]
+            self.reclaimed += dead
+            self._index = None
+        return alive
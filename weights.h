@@ -0,0 +1,131 @@
+#ifndef WEIGHTS_H
+#define WEIGHTS_H
+
+// Weighted site sampling for spatialsoft2d.cpp: the cumulative-weight map it
+// uses, and FenwickWeights, a binary indexed tree over a flat array of site
+// weights that does the same draws with in-place updates.
+// weights_benchmark.cpp times the two against each other.
+
+#include <iostream>
+#include <map>
+#include <vector>
+#include "lrd2d.h"
+
+// weights are over flat sites [0, L^d)
+using weightMap = std::map<double, int>;  // key: cumulative length, value: quantizedPoint (int)
+
+inline double P_BARE = 1;
+inline weightMap weights;
+
+inline double lastweightKey = 0.0;
+
+inline void addToEnd(int pt, double length) {
+    if (weights.empty()) {
+        weights[length] = pt;
+        lastweightKey = length;
+        return;
+    }
+    auto it = weights.end();
+    --it;
+    double newKey = it->first + length;
+    weights[newKey] = pt;
+    lastweightKey = newKey;
+}
+
+
+inline void print_weights() {
+    for (auto it = weights.begin(); it != weights.end(); ++it) {
+        std::cout << it->first << ' ' << it->second << '\n';
+    }
+}
+
+inline void initialize_weights(latticeLongRangeSim &sim, double weight) {
+    // Give every site an initial weight segment of length `weight`; one per
+    // node of the network (sizeof gave the size of the map object itself)
+    const long long total = static_cast<long long>(sim.network.size());
+    for (long long i = 0; i < total; ++i) {
+        addToEnd(static_cast<int>(i), weight);
+    }
+}
+
+inline weightMap::iterator randomFromWeights(latticeLongRangeSim &sim) {
+    // pick uniformly in [0, lastweightKey)
+    double randomKey = sim.rand01(sim.rng) * lastweightKey;
+    return weights.upper_bound(randomKey);
+}
+
+// Find the iterator corresponding to a given flat site `pt` when every site’s
+// segment length is `weight`. The segment center is at (pt + 0.5) * weight.
+inline weightMap::iterator weight_position(int pt, double weight) {
+    const double center = (static_cast<double>(pt) + 0.5) * weight;
+    return weights.lower_bound(center);
+}
+
+// Mark a weighted entry as “claimed” (store negative index) and add a new segment
+inline void addNewMutation(latticeLongRangeSim &sim, weightMap::iterator basept, int color, double mutrate) {
+    sim.addPoint(basept->second, color);                 // occupy site with new color
+    basept->second = -static_cast<int>(sim.sites.size()); // mark as linked to current index
+    addToEnd(basept->second, P_BARE - mutrate);          // append new weight segment
+}
+
+inline bool tryCopyMutation(latticeLongRangeSim &sim, int newpt, int color, double mutrate) {
+    if (sim.addPoint(newpt, color)) {
+        int newidx = static_cast<int>(sim.sites.size());
+        auto it = weight_position(newpt, mutrate);
+        if (it != weights.end()) {
+            it->second = -newidx;    // mark source weight slot
+        }
+        int marker = -newidx;
+        addToEnd(marker, P_BARE - mutrate);
+        return true;
+    }
+    return false;
+}
+
+
+// Binary indexed tree over the weights of n sites: set() changes one weight
+// in place and sample() draws a site with probability proportional to its
+// weight, both in O(log n), and the tree never grows.
+struct FenwickWeights {
+    std::vector<double> weights, tree;
+    int top;
+    double total;
+
+    explicit FenwickWeights(int n, double weight = 0.0)
+        : weights(n, 0.0), tree(n + 1, 0.0), top(1), total(0.0) {
+        while (2 * top <= n) top *= 2;
+        for (int i = 0; i < n; ++i) set(i, weight);
+    }
+
+    void set(int i, double value) {
+        double delta = value - weights[i];
+        weights[i] = value;
+        total += delta;
+        for (int k = i + 1; k < static_cast<int>(tree.size()); k += k & -k)
+            tree[k] += delta;
+    }
+
+    // the site owning point `value` of [0, total) on the cumulative line
+    int find(double value) const {
+        int pos = 0;
+        for (int step = top; step; step >>= 1) {
+            int next = pos + step;
+            if (next < static_cast<int>(tree.size()) && tree[next] <= value) {
+                value -= tree[next];
+                pos = next;
+            }
+        }
+        return std::min(pos, static_cast<int>(weights.size()) - 1);
+    }
+
+    int sample(latticeLongRangeSim &sim) {
+        // round-off can land on a zero-weight site; redraw those
+        int i;
+        do {
+            i = find(sim.rand01(sim.rng) * total);
+        } while (weights[i] <= 0);
+        return i;
+    }
+};
+
+#endif
@@ -0,0 +1,63 @@
+//  weights_benchmark
+//
+//  Times one weighted draw plus one weight change per event with the
+//  cumulative-weight map of spatialsoft2d.cpp (randomFromWeights, then the
+//  weight_position / addToEnd pair of tryCopyMutation) against
+//  FenwickWeights (sample, then set). Both come from weights.h, so the map
+//  side is the code spatialsoft2d.cpp runs. Build and run with
+//      g++ -std=c++17 -O3 -o weights_benchmark weights_benchmark.cpp lrd2d.cpp
+//      ./weights_benchmark [n] [events] [seed]
+//  or fenwick.benchmark(). Prints "<sampler> <ns per event> <entries>".
+
+#include <chrono>
+#include <cstdlib>
+#include <iostream>
+#include <vector>
+#include "lrd2d.h"
+#include "weights.h"
+
+int main(int argc, char **argv) {
+    int n = argc > 1 ? std::atoi(argv[1]) : 1000;
+    int events = argc > 2 ? std::atoi(argv[2]) : 1000000;
+    int seed = argc > 3 ? std::atoi(argv[3]) : 0;
+    double mutrate = 0.01;
+
+    latticeLongRangeSim sim(2, 0, n, true, n);
+    for (int i = 0; i < n; ++i) sim.network[i];
+    sim.rng.seed(seed);
+    std::vector<int> sites(events);
+    std::vector<double> values(events);
+    for (int k = 0; k < events; ++k) {
+        sites[k] = static_cast<int>(sim.rand01(sim.rng) * n) % n;
+        values[k] = sim.rand01(sim.rng);
+    }
+    using clock = std::chrono::steady_clock;
+    long long checksum = 0;
+
+    // as a replicate of spatialsoft2d.cpp sets the map up
+    weights.clear();
+    lastweightKey = 0.0;
+    addToEnd(0, 0.0);
+    initialize_weights(sim, mutrate);
+    auto start = clock::now();
+    for (int k = 0; k < events; ++k) {
+        checksum += randomFromWeights(sim)->second;
+        auto it = weight_position(sites[k], mutrate);
+        if (it != weights.end()) it->second = -(k + 1);
+        addToEnd(-(k + 1), P_BARE - mutrate);
+    }
+    double map_time = std::chrono::duration<double>(clock::now() - start).count();
+    std::cout << "map " << 1e9 * map_time / events << ' ' << weights.size() << '\n';
+
+    FenwickWeights tree(n, mutrate);
+    start = clock::now();
+    for (int k = 0; k < events; ++k) {
+        checksum += tree.sample(sim);
+        tree.set(sites[k], values[k]);
+    }
+    double tree_time = std::chrono::duration<double>(clock::now() - start).count();
+    std::cout << "fenwick " << 1e9 * tree_time / events << ' ' << n << '\n';
+
+    std::cerr << "checksum " << checksum << '\n';
+    return 0;
+}